@@ -1,9 +1,32 @@
 """ArXiv paper fetcher module."""
 
-from .arxiv_client import ArxivClient
-from .cache_manager import CacheManager
-from .formatter import PaperFormatter
-from .exporters import export_to_json, export_to_csv
-from .paper_analyzer import analyze_papers, analyze_paper
+import importlib
 
-__version__ = "1.0.0"
\ No newline at end of file
+__version__ = "1.0.0"
+
+# Public names and the submodules defining them. They are imported on first
+# access, so importing the package (as the CLI does) stays cheap.
+_EXPORTS = {
+    'ArxivClient': 'arxiv_client',
+    'CacheManager': 'cache_manager',
+    'PaperFormatter': 'formatter',
+    'export_to_json': 'exporters',
+    'export_to_csv': 'exporters',
+    'analyze_papers': 'paper_analyzer',
+    'analyze_paper': 'paper_analyzer',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_EXPORTS])
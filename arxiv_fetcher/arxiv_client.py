@@ -1,26 +1,77 @@
 """ArXiv API client for fetching research papers."""
 
-import urllib.request
+import contextlib
+import http.client
 import urllib.parse
-import urllib.error
+import re
 import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
-import time
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
-from .config import ARXIV_API_URL, API_DELAY, DEFAULT_CATEGORY
+from .config import (ARXIV_API_URL, API_DELAY, DEFAULT_CATEGORY, PAGE_SIZE,
+                     SUBMITTED_DATE_FORMAT)
+from .http_pool import HTTPConnectionPool, get_default_pool
+from .paper import Paper
+from .query_planner import (PlannedQuery, category_query, matches_combo, normalize_combo,
+                            plan_queries, split_by_combo)
+from .rate_limiter import RateLimiter
+from .response_cache import ResponseCache
+
+ATOM_NAMESPACE = {'atom': 'http://www.w3.org/2005/Atom'}
+ATOM_ENTRY_TAG = '{http://www.w3.org/2005/Atom}entry'
+OPENSEARCH_TOTAL_RESULTS_TAG = '{http://a9.com/-/spec/opensearch/1.1/}totalResults'
+VERSION_SUFFIX = re.compile(r'v[0-9]+$')
+
+# Shared by every client in the process so parallel fetches honour API_DELAY together
+_default_rate_limiter = RateLimiter(API_DELAY)
+
+def parse_published(published: str) -> datetime:
+    """Parse an Atom ``published`` timestamp into a naive UTC datetime."""
+    return datetime.strptime(published[:19], '%Y-%m-%dT%H:%M:%S')
 
 class ArxivClient:
-    def __init__(self):
-        self.last_request_time = 0
+    def __init__(self, rate_limiter: Optional[RateLimiter] = None,
+                 http_pool: Optional[HTTPConnectionPool] = None,
+                 response_cache: Optional[ResponseCache] = None):
+        """Initialize the client.
+
+        Args:
+            rate_limiter: Limiter spacing requests; defaults to the process-wide one
+            http_pool: Pool used for requests; defaults to the shared pool
+            response_cache: Optional cache of raw API responses; pages it can
+                       replay do not wait for the rate limiter
+        """
+        self.rate_limiter = rate_limiter or _default_rate_limiter
+        self.http_pool = http_pool or get_default_pool()
+        self.response_cache = response_cache
+        # Counters over every fetch made by this client
+        self.scan_stats = self._new_scan_stats()
+        # Normalized combos whose whole date window the last fetch scanned
+        self.complete_combos = set()
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _new_scan_stats() -> Dict[str, int]:
+        """Return zeroed counters describing how much of a scan was skipped."""
+        return {
+            'pages_fetched': 0,
+            'entries_parsed': 0,
+            'pages_skipped': 0,
+            'entries_skipped': 0,
+            'queries_planned': 0,
+            'duplicates_merged': 0,
+        }
 
     def _respect_rate_limit(self):
         """Ensure we don't exceed API rate limits."""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < API_DELAY:
-            time.sleep(API_DELAY - time_since_last_request)
-        self.last_request_time = time.time()
+        self.rate_limiter.acquire()
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        """Increment a scan counter; safe to call from worker threads."""
+        with self._stats_lock:
+            self.scan_stats[name] += amount
 
     def _safe_get_text(self, element: Optional[ET.Element], namespace: Dict[str, str], path: str) -> str:
         """Safely get text from XML element."""
@@ -29,82 +80,330 @@ class ArxivClient:
         found = element.find(path, namespace)
         return found.text.strip() if found is not None and found.text is not None else ""
 
-    def fetch_papers(self, days: int, max_results: int, categories: List[tuple] = None) -> List[Dict[str, Any]]:
-        """Fetch papers from arXiv API.
-        
+    def _build_query(self, category_query: str, start_date: datetime, end_date: datetime) -> str:
+        """Bound a category query by submission date."""
+        date_range = (f"submittedDate:[{start_date.strftime(SUBMITTED_DATE_FORMAT)} "
+                      f"TO {end_date.strftime(SUBMITTED_DATE_FORMAT)}]")
+        return f'{category_query} AND {date_range}'
+
+    def _parse_entry(self, entry: ET.Element, namespace: Dict[str, str],
+                     published: datetime) -> Paper:
+        """Extract paper details from an Atom entry."""
+        return Paper(
+            title=self._safe_get_text(entry, namespace, 'atom:title'),
+            authors=[
+                self._safe_get_text(author, namespace, 'atom:name')
+                for author in entry.findall('atom:author', namespace)
+            ],
+            published=published,
+            summary=self._safe_get_text(entry, namespace, 'atom:summary'),
+            link=self._safe_get_text(entry, namespace, 'atom:id'),
+            categories=[
+                cat.get('term', '')
+                for cat in entry.findall('atom:category', namespace)
+            ]
+        )
+
+    def _iter_page(self, query: str, start: int, page_size: int, start_date: datetime,
+                   page_info: Dict[str, Any]) -> Iterator[Paper]:
+        """Fetch a single page of results for a query, yielding papers as they are parsed.
+
+        The Atom feed is parsed incrementally straight from the response, and
+        each entry is discarded once converted, so memory use does not grow
+        with the page size. Results are sorted by descending submission date,
+        so parsing stops at the first entry published before ``start_date``
+        and ``page_info['boundary_reached']`` is set. ``page_info`` also
+        receives the server-reported ``total_results`` and the number of
+        ``entries`` read from the page.
+        """
+        self._count('pages_fetched')
+
+        query_params = {
+            'search_query': query,
+            'start': start,
+            'max_results': page_size,
+            'sortBy': 'submittedDate',
+            'sortOrder': 'descending'
+        }
+
+        url = f"{ARXIV_API_URL}?{urllib.parse.urlencode(query_params)}"
+        if self.response_cache is not None:
+            # The cache waits for the rate limiter only if it has to go to arXiv
+            opened = self.response_cache.open(url, self.rate_limiter)
+        else:
+            self._respect_rate_limit()
+            opened = self.http_pool.open(url)
+
+        with opened as response:
+            root = None
+            for event, element in ET.iterparse(response, events=('start', 'end')):
+                if root is None:
+                    root = element
+                if event != 'end':
+                    continue
+                if element.tag == OPENSEARCH_TOTAL_RESULTS_TAG and element.text:
+                    page_info['total_results'] = int(element.text)
+                elif element.tag == ATOM_ENTRY_TAG:
+                    page_info['entries'] += 1
+                    published = parse_published(
+                        self._safe_get_text(element, ATOM_NAMESPACE, 'atom:published'))
+                    if published < start_date:
+                        page_info['boundary_reached'] = True
+                        return
+                    self._count('entries_parsed')
+                    yield self._parse_entry(element, ATOM_NAMESPACE, published)
+                    element.clear()
+                    root.remove(element)
+
+    def _record_skipped(self, page_info: Dict[str, Any], start: int, page_size: int) -> None:
+        """Count the entries and pages of a result set left unread after the window boundary."""
+        total_results = page_info.get('total_results')
+        if total_results is None:
+            return
+        # The entry that crossed the boundary was read but never converted
+        remaining = max(total_results - start - page_info['entries'] + 1, 0)
+        self._count('entries_skipped', remaining)
+        unread_after_page = max(total_results - start - page_size, 0)
+        self._count('pages_skipped', -(-unread_after_page // PAGE_SIZE))
+
+    @staticmethod
+    def paper_id(paper: Dict[str, Any]) -> str:
+        """Return the version-less arXiv ID of a paper, e.g. '2401.12345'."""
+        link = paper.get('link', '')
+        arxiv_id = link.rsplit('/abs/', 1)[-1]
+        return VERSION_SUFFIX.sub('', arxiv_id)
+
+    def _deduplicate(self, papers: Iterator[Paper]) -> Iterator[Paper]:
+        """Drop papers already yielded by an earlier query, merging their categories.
+
+        The first copy of a paper is the one yielded; categories reported by
+        later copies are appended to it in place.
+        """
+        seen: Dict[str, Paper] = {}
+        for paper in papers:
+            arxiv_id = self.paper_id(paper)
+            first = seen.get(arxiv_id)
+            if first is None:
+                seen[arxiv_id] = paper
+                yield paper
+                continue
+
+            self._count('duplicates_merged')
+            for category in paper['categories']:
+                if category not in first['categories']:
+                    first['categories'].append(category)
+
+    def _iter_query(self, planned: PlannedQuery, combo_starts: Dict[tuple, datetime],
+                    end_date: datetime, max_results: Optional[int]) -> Iterator[Paper]:
+        """Yield the papers in the date window that match one of a planned query's combos.
+
+        Every combo gets up to max_results papers of its own (all of them if
+        max_results is None), so paging goes on until each combo has them or
+        its window is exhausted. Once some
+        combos are done, the query is narrowed to the open ones and resumes
+        from the oldest paper read, so a dense category neither starves a
+        sparse one nor makes it page through results nobody needs. Combos
+        whose whole window was scanned are added to ``complete_combos``.
+        """
+        counts = {combo: 0 for combo in planned.combos}
+        open_combos = list(planned.combos)
+        combos_query = planned.category_query
+        query_end = end_date
+        seen = set()
+        try:
+            while open_combos:
+                start_date = min(combo_starts[combo] for combo in open_combos)
+                query = self._build_query(combos_query, start_date, query_end)
+                queried_combos = len(open_combos)
+                start = 0
+                narrowed = False
+                while not narrowed:
+                    page_size = PAGE_SIZE
+                    if max_results is not None:
+                        # No open combo needs more than this many further entries
+                        page_size = min(PAGE_SIZE, max(max_results - counts[combo]
+                                                       for combo in open_combos))
+                    page_info = {'entries': 0, 'boundary_reached': False}
+                    oldest = None
+                    page = self._iter_page(query, start, page_size, start_date, page_info)
+                    # Closing the page stops parsing and releases the response
+                    with contextlib.closing(page):
+                        for paper in page:
+                            published = oldest = paper.published_at
+                            arxiv_id = self.paper_id(paper)
+                            if published > end_date or arxiv_id in seen:
+                                continue
+                            seen.add(arxiv_id)
+                            # Combos whose window starts after this paper are fully scanned
+                            for combo in [c for c in open_combos if combo_starts[c] > published]:
+                                self._complete(combo, open_combos)
+                            matched = [combo for combo in open_combos
+                                       if matches_combo(paper, combo)]
+                            for combo in matched:
+                                counts[combo] += 1
+                                if max_results is not None and counts[combo] >= max_results:
+                                    open_combos.remove(combo)
+                            if matched:
+                                yield paper
+                            if not open_combos:
+                                break
+
+                    if not open_combos:
+                        break
+                    if page_info['boundary_reached'] or page_info['entries'] < page_size:
+                        if page_info['boundary_reached']:
+                            self._record_skipped(page_info, start, page_size)
+                        # The window is exhausted for every combo still open
+                        for combo in list(open_combos):
+                            self._complete(combo, open_combos)
+                        break
+                    start += page_size
+
+                    if len(open_combos) < queried_combos and oldest is not None:
+                        # Resume with a query for the open combos only; the end
+                        # is rounded up to the next minute, and papers read
+                        # again because of that are skipped
+                        combos_query = category_query(open_combos)
+                        query_end, narrowed = oldest + timedelta(minutes=1), True
+
+        except (OSError, http.client.HTTPException, ET.ParseError) as e:
+            raise Exception(f"Error fetching papers from arXiv: {str(e)}")
+
+    def _complete(self, combo: tuple, open_combos: List[tuple]) -> None:
+        """Close a combo whose whole window has been scanned."""
+        open_combos.remove(combo)
+        with self._stats_lock:
+            self.complete_combos.add(combo)
+
+    def _collect_query(self, planned: PlannedQuery, combo_starts: Dict[tuple, datetime],
+                       end_date: datetime, max_results: Optional[int]) -> List[Paper]:
+        """Fetch every paper for one planned query; used by worker threads."""
+        return list(self._iter_query(planned, combo_starts, end_date, max_results))
+
+    def _iter_plan(self, plan: List[PlannedQuery], combo_starts: Dict[tuple, datetime],
+                   end_date: datetime, max_results: Optional[int],
+                   concurrency: int) -> Iterator[Paper]:
+        """Yield the papers of every query in the plan, in plan order."""
+        if concurrency <= 1 or len(plan) == 1:
+            for planned in plan:
+                yield from self._iter_query(planned, combo_starts, end_date, max_results)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [
+                executor.submit(self._collect_query, planned, combo_starts, end_date, max_results)
+                for planned in plan
+            ]
+            try:
+                for future in futures:
+                    yield from future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _combo_starts(self, categories: List[tuple], start_date: datetime,
+                      since: Optional[Dict[tuple, datetime]]) -> Dict[tuple, datetime]:
+        """Return the start of the fetch window for every normalized combo."""
+        since = since or {}
+        combo_starts = {}
+        for combo in categories:
+            combo = normalize_combo(combo)
+            combo_start = since.get(combo)
+            combo_starts[combo] = max(start_date, combo_start) if combo_start else start_date
+        return combo_starts
+
+    def iter_papers(self, days: int, max_results: Optional[int], categories: List[tuple] = None,
+                    concurrency: int = 1,
+                    since: Optional[Dict[tuple, datetime]] = None,
+                    until: Optional[datetime] = None) -> Iterator[Paper]:
+        """Yield papers from arXiv API as soon as each entry is parsed.
+
+        Category combinations are first collapsed into the smallest set of
+        arXiv queries (see ``query_planner.plan_queries``) and results are
+        matched back to the original combinations client-side; each
+        combination is paged until it has max_results papers of its own. The
+        submission date window is sent to arXiv as part of each query and
+        each page asks for at most ``PAGE_SIZE`` entries, and no more than
+        the open combinations still need, so only pages that fall inside the
+        window are downloaded. A paper matched by
+        several category combinations is yielded once, with the categories of
+        every copy merged into it.
+
         Args:
             days: Number of days to look back
-            max_results: Maximum number of results to return
+            max_results: Maximum number of results to return per category combination,
+                       or None to return every paper in the window
             categories: List of tuples, each containing (cat1, cat2, operator)
                        where operator is 'AND' or 'OR'. If None, uses DEFAULT_CATEGORY
+            concurrency: Number of planned queries fetched in parallel. All
+                       workers share the client's rate limiter, so requests stay
+                       spaced by API_DELAY while network waits and parsing overlap.
+                       Papers are still yielded in plan order.
+            since: Optional per-combo watermarks, keyed by normalized combo. Only
+                       papers published at or after a combo's watermark are
+                       fetched for it.
+            until: Optional end of the window (naive UTC); defaults to now.
+                       The window still starts ``days`` before now. A fixed
+                       end, such as the end of the current day, keeps request
+                       URLs stable, so cached responses can be reused.
         """
-        self._respect_rate_limit()
+        self.complete_combos = set()
 
-        # Calculate date range
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-
-        all_papers = []
+        # Calculate date range (arXiv timestamps are in UTC)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        start_date = now - timedelta(days=days)
+        end_date = until or now
 
         # If no categories specified, use default
         if not categories:
             categories = [(DEFAULT_CATEGORY, None, 'AND')]
 
-        # Query for each combination of categories
-        for combo in categories:
-            cat1, cat2, operator = combo if len(combo) == 3 else (*combo, 'AND')
-            
-            # Construct query based on whether we have one or two categories
-            if cat2:
-                query = f'cat:{cat1} {operator} cat:{cat2}'
-            else:
-                query = f'cat:{cat1}'
-                
-            query_params = {
-                'search_query': query,
-                'start': 0,
-                'max_results': max_results,
-                'sortBy': 'submittedDate',
-                'sortOrder': 'descending'
-            }
-
-            # Clear the cache to ensure fresh results
-            if hasattr(self, '_cache'):
-                self._cache.clear()
+        plan = plan_queries(categories)
+        self._count('queries_planned', len(plan))
+        combo_starts = self._combo_starts(categories, start_date, since)
 
-            try:
-                # Make request
-                url = f"{ARXIV_API_URL}?{urllib.parse.urlencode(query_params)}"
-                response = urllib.request.urlopen(url)
-                data = response.read().decode('utf-8')
-
-                # Parse XML response
-                root = ET.fromstring(data)
-                namespace = {'atom': 'http://www.w3.org/2005/Atom'}
-
-                for entry in root.findall('atom:entry', namespace):
-                    # Extract paper details
-                    paper = {
-                        'title': self._safe_get_text(entry, namespace, 'atom:title'),
-                        'authors': [
-                            self._safe_get_text(author, namespace, 'atom:name')
-                            for author in entry.findall('atom:author', namespace)
-                        ],
-                        'published': self._safe_get_text(entry, namespace, 'atom:published'),
-                        'summary': self._safe_get_text(entry, namespace, 'atom:summary'),
-                        'link': self._safe_get_text(entry, namespace, 'atom:id'),
-                        'categories': [
-                            cat.get('term', '')
-                            for cat in entry.findall('atom:category', namespace)
-                        ]
-                    }
-
-                    # Filter by date
-                    pub_date = datetime.strptime(paper['published'][:10], '%Y-%m-%d')
-                    if start_date <= pub_date <= end_date:
-                        all_papers.append(paper)
-
-            except (urllib.error.URLError, ET.ParseError) as e:
-                raise Exception(f"Error fetching papers from arXiv: {str(e)}")
-
-        return all_papers
+        yield from self._deduplicate(
+            self._iter_plan(plan, combo_starts, end_date, max_results, concurrency))
+
+    def fetch_papers(self, days: int, max_results: Optional[int], categories: List[tuple] = None,
+                     concurrency: int = 1,
+                     since: Optional[Dict[tuple, datetime]] = None,
+                     until: Optional[datetime] = None) -> List[Paper]:
+        """Fetch papers from arXiv API.
+
+        Args:
+            days: Number of days to look back
+            max_results: Maximum number of results to return per category combination,
+                       or None to return every paper in the window
+            categories: List of tuples, each containing (cat1, cat2, operator)
+                       where operator is 'AND' or 'OR'. If None, uses DEFAULT_CATEGORY
+            concurrency: Number of planned queries fetched in parallel
+            since: Optional per-combo watermarks, keyed by normalized combo
+            until: Optional end of the window (naive UTC); defaults to now
+        """
+        return list(self.iter_papers(days, max_results, categories, concurrency, since, until))
+
+    def fetch_papers_by_combo(self, days: int, max_results: Optional[int],
+                              categories: List[tuple] = None,
+                              concurrency: int = 1,
+                              since: Optional[Dict[tuple, datetime]] = None,
+                              until: Optional[datetime] = None
+                              ) -> Dict[tuple, List[Paper]]:
+        """Fetch papers and split them by the normalized category combination they match.
+
+        A paper matching several combinations appears under each of them, and
+        papers older than a combo's ``since`` watermark are left out of it.
+        """
+        if not categories:
+            categories = [(DEFAULT_CATEGORY, None, 'AND')]
+        papers = self.fetch_papers(days, max_results, categories, concurrency, since, until)
+        # Papers come one planned query after another, and a paper from one
+        # query may match a combo answered by another, so the split needs
+        # them newest first across all queries
+        papers.sort(key=lambda paper: paper.published_at, reverse=True)
+        results = split_by_combo(papers, categories, max_results)
+        for combo, watermark in (since or {}).items():
+            if combo in results:
+                results[combo] = [paper for paper in results[combo]
+                                  if paper.published_at >= watermark]
+        return results
@@ -0,0 +1,469 @@
+"""Storage backends for CacheManager."""
+
+import atexit
+import base64
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .cache_codecs import decode, encode
+from .config import CACHE_ACCESS_BATCH
+from .file_lock import file_lock
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# (timestamp, data, expires, size) as stored for a key; expires is None for
+# entries that use the cache's default duration, size is the stored payload size
+CacheEntry = Tuple[float, Any, Optional[float], int]
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Write JSON to a temporary file and atomically move it into place."""
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory,
+                                     suffix='.tmp', delete=False) as f:
+        try:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+class JSONFileBackend:
+    """Stores every entry in a single JSON file that is rewritten on each write.
+
+    Writers hold a lock on ``<cache_file>.lock``, re-read the current file,
+    apply their change and atomically replace the file, so parallel
+    processes never interleave writes or drop each other's entries, and
+    readers never see a partially written file.
+
+    Entries written with the 'json' codec keep their data inline; compressed
+    entries store a base64 payload and their codec, so loading the file only
+    parses short strings and a lookup decompresses just the entry it needs.
+
+    Reads do not record access times (that would mean rewriting the file on
+    every lookup), so size-bound eviction removes the oldest-written entries.
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self.lock_file = f'{cache_file}.lock'
+        # (file token after our last save, token the file had before our saves)
+        self._own_version: Optional[Tuple[Any, Any]] = None
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+    @staticmethod
+    def _entry_data(entry: Any) -> Any:
+        """Return the data of a stored entry; raises ValueError if it is unreadable."""
+        if not isinstance(entry, dict) or 'timestamp' not in entry:
+            raise ValueError("Malformed cache entry")
+        if 'codec' in entry:
+            return decode(base64.b64decode(entry['payload']), entry['codec'])
+        if 'data' not in entry:
+            raise ValueError("Malformed cache entry")
+        return entry['data']
+
+    @staticmethod
+    def _entry_size(entry: Dict[str, Any]) -> int:
+        if 'codec' in entry:
+            return len(entry['payload'])
+        return len(json.dumps(entry.get('data')))
+
+    def read(self, key: str) -> Optional[CacheEntry]:
+        """Return the (timestamp, data, expires, size) stored for a key, or None."""
+        entry = self._load().get(key)
+        try:
+            data = self._entry_data(entry)
+        except ValueError:
+            return None
+        return entry['timestamp'], data, entry.get('expires'), self._entry_size(entry)
+
+    def entries(self, prefix: str = '') -> Iterator[Tuple[str, CacheEntry]]:
+        """Yield the key and entry of every readable entry whose key starts with prefix."""
+        for key, entry in self._load().items():
+            if not key.startswith(prefix):
+                continue
+            try:
+                data = self._entry_data(entry)
+            except ValueError:
+                continue
+            yield key, (entry['timestamp'], data, entry.get('expires'), self._entry_size(entry))
+
+    def write(self, key: str, timestamp: float, data: Any,
+              expires: Optional[float] = None, codec: str = 'json') -> int:
+        """Store data for a key, merging it into the latest contents of the file.
+
+        Returns the size of the stored payload.
+        """
+        entry: Dict[str, Any] = {'timestamp': timestamp}
+        if codec == 'json':
+            entry['data'] = data
+        else:
+            entry['codec'] = codec
+            entry['payload'] = base64.b64encode(encode(data, codec)).decode('ascii')
+        if expires is not None:
+            entry['expires'] = expires
+
+        with file_lock(self.lock_file):
+            cache = self._load()
+            cache[key] = entry
+            self._save(cache)
+        return self._entry_size(entry)
+
+    def _file_token(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.cache_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _unless_own(self, token: Any) -> Any:
+        """Map the token of a file this backend wrote to the token from before its writes."""
+        own = self._own_version
+        return own[1] if own is not None and token == own[0] else token
+
+    def version(self) -> Any:
+        """Return a token that changes whenever another process rewrites the file.
+
+        Rewrites made through this backend leave it unchanged, like the
+        SQLite backend's, so callers can tell them apart from foreign ones.
+        """
+        return self._unless_own(self._file_token())
+
+    def _save(self, cache: Dict[str, Any]) -> None:
+        # Called with the file lock held, so nobody else writes in between
+        before = self._unless_own(self._file_token())
+        write_json_atomic(self.cache_file, cache)
+        self._own_version = (self._file_token(), before)
+
+    def touch(self, key: str) -> None:
+        """Do nothing: access times are not recorded (see the class docstring)."""
+
+    def flush(self) -> None:
+        """Do nothing: every write is already on disk."""
+
+    def prune(self, expired_before: float, default_duration: float,
+              max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """Delete entries that expired before a time, then the oldest entries until the limits hold.
+
+        Entries without their own expiry time expire default_duration seconds
+        after they were written. Returns the number of (expired, evicted)
+        entries removed.
+        """
+        with file_lock(self.lock_file):
+            return self._prune(self._load(), expired_before, default_duration,
+                               max_entries, max_bytes)
+
+    def _prune(self, cache: Dict[str, Any], expired_before: float, default_duration: float,
+               max_entries: Optional[int], max_bytes: Optional[int]) -> Tuple[int, int]:
+        if not cache:
+            return 0, 0
+
+        live = {}
+        for key, entry in cache.items():
+            if not isinstance(entry, dict):
+                continue
+            expires = entry.get('expires')
+            if expires is None:
+                expires = entry.get('timestamp', 0) + default_duration
+            if expires >= expired_before:
+                live[key] = entry
+        expired = len(cache) - len(live)
+
+        by_age = sorted(live, key=lambda key: live[key]['timestamp'])
+        sizes = {key: self._entry_size(live[key]) for key in by_age}
+        total_bytes = sum(sizes.values())
+        evicted = 0
+        for key in by_age:
+            if ((max_entries is None or len(live) <= max_entries)
+                    and (max_bytes is None or total_bytes <= max_bytes)):
+                break
+            total_bytes -= sizes[key]
+            del live[key]
+            evicted += 1
+
+        if expired or evicted:
+            self._save(live)
+        return expired, evicted
+
+
+class SQLiteBackend:
+    """Stores entries as rows of a SQLite database in WAL mode.
+
+    Lookups and writes touch a single row through the primary-key index,
+    so their cost does not grow with the size of the cache. Each row also
+    records its payload size and when it was last read, for LRU eviction,
+    and the codec its data was written with (NULL for plain JSON text).
+    Triggers keep the entry count and total size in the ``totals`` table,
+    so pruning does not have to scan the cache to check the bounds.
+
+    Access times are collected in memory and written CACHE_ACCESS_BATCH at
+    a time, with the next write or prune, or at exit, so reads do not
+    commit and flush other processes' memory tiers.
+    """
+
+    def __init__(self, cache_file: str):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._connection = sqlite3.connect(cache_file, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, '
+            'timestamp REAL NOT NULL, '
+            'data TEXT NOT NULL, '
+            'accessed REAL, '
+            'size INTEGER NOT NULL DEFAULT 0, '
+            'expires REAL, '
+            'codec TEXT)'
+        )
+        columns = {row[1] for row in self._connection.execute('PRAGMA table_info(cache)')}
+        if 'accessed' not in columns:
+            # Databases created before LRU eviction was added
+            self._connection.execute('ALTER TABLE cache ADD COLUMN accessed REAL')
+            self._connection.execute(
+                'ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+            self._connection.execute('UPDATE cache SET accessed = timestamp, size = length(data)')
+        if 'expires' not in columns:
+            # Databases created before per-entry expiry was added
+            self._connection.execute('ALTER TABLE cache ADD COLUMN expires REAL')
+        if 'codec' not in columns:
+            # Databases created before compressed entries were added
+            self._connection.execute('ALTER TABLE cache ADD COLUMN codec TEXT')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS cache_timestamp ON cache (timestamp)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires, timestamp)')
+        self._create_totals()
+        self._connection.commit()
+
+    def _create_totals(self) -> None:
+        """Create the single-row table of running totals and the triggers that maintain it."""
+        # Under a write lock, so no other process writes between the count and the triggers
+        self._connection.commit()
+        self._connection.execute('BEGIN IMMEDIATE')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS totals (entries INTEGER NOT NULL, bytes INTEGER NOT NULL)')
+        if self._connection.execute('SELECT 1 FROM totals').fetchone() is None:
+            # Databases created before running totals were added are counted once
+            self._connection.execute(
+                'INSERT INTO totals SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache')
+        self._connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN '
+            'UPDATE totals SET entries = entries + 1, bytes = bytes + new.size; END')
+        self._connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN '
+            'UPDATE totals SET entries = entries - 1, bytes = bytes - old.size; END')
+        self._connection.execute(
+            'CREATE TRIGGER IF NOT EXISTS cache_resize AFTER UPDATE OF size ON cache BEGIN '
+            'UPDATE totals SET bytes = bytes - old.size + new.size; END')
+
+    def read(self, key: str) -> Optional[CacheEntry]:
+        """Return the (timestamp, data, expires, size) stored for a key, or None.
+
+        A found key is marked as accessed (see ``touch``).
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT timestamp, data, expires, codec, size FROM cache WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        self.touch(key)
+        try:
+            return row[0], decode(row[1], row[3] or 'json'), row[2], row[4]
+        except ValueError:
+            return None
+
+    def entries(self, prefix: str = '') -> Iterator[Tuple[str, CacheEntry]]:
+        """Yield the key and entry of every readable entry whose key starts with prefix.
+
+        Unlike ``read``, this does not update access times, so scanning the
+        cache does not affect LRU eviction.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, timestamp, data, expires, codec, size FROM cache '
+                'WHERE substr(key, 1, ?) = ?', (len(prefix), prefix)).fetchall()
+        for key, timestamp, data, expires, codec, size in rows:
+            try:
+                data = decode(data, codec or 'json')
+            except ValueError:
+                continue
+            yield key, (timestamp, data, expires, size)
+
+    def touch(self, key: str) -> None:
+        """Record that a key was used; the access time is written with the next batch."""
+        with self._lock:
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= CACHE_ACCESS_BATCH:
+                with self._connection:
+                    self._write_accessed()
+
+    def _write_accessed(self) -> None:
+        """Write the collected access times; called with the lock held, inside a transaction."""
+        if self._accessed:
+            self._connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def flush(self) -> None:
+        """Write the access times collected so far."""
+        with self._lock, self._connection:
+            self._write_accessed()
+
+    def version(self) -> int:
+        """Return a token that changes whenever another connection commits.
+
+        Commits made through this backend's own connection (including
+        batches of access times) leave it unchanged.
+        """
+        with self._lock:
+            return self._connection.execute('PRAGMA data_version').fetchone()[0]
+
+    def write(self, key: str, timestamp: float, data: Any,
+              expires: Optional[float] = None, codec: str = 'json') -> int:
+        """Store data for a key; compressed payloads are stored as BLOBs.
+
+        Returns the size of the stored payload.
+        """
+        if codec == 'json':
+            payload = json.dumps(data)
+            stored_codec = None
+        else:
+            payload = encode(data, codec)
+            stored_codec = codec
+        with self._lock, self._connection:
+            self._write_accessed()
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete
+            # would not fire the trigger that keeps the totals
+            self._connection.execute(
+                'INSERT INTO cache '
+                '(key, timestamp, data, accessed, size, expires, codec) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET timestamp = excluded.timestamp, '
+                'data = excluded.data, accessed = excluded.accessed, size = excluded.size, '
+                'expires = excluded.expires, codec = excluded.codec',
+                (key, timestamp, payload, timestamp, len(payload), expires, stored_codec))
+        return len(payload)
+
+    def prune(self, expired_before: float, default_duration: float,
+              max_entries: Optional[int] = None,
+              max_bytes: Optional[int] = None) -> Tuple[int, int]:
+        """Delete entries that expired before a time, then least recently used entries until the limits hold.
+
+        Entries without their own expiry time expire default_duration seconds
+        after they were written. Returns the number of (expired, evicted)
+        entries removed.
+        """
+        with self._lock, self._connection:
+            # Evict by up-to-date access times
+            self._write_accessed()
+            # Two indexed conditions rather than one on COALESCE(expires, ...),
+            # which no index could serve
+            expired = self._connection.execute(
+                'DELETE FROM cache WHERE expires < ? OR (expires IS NULL AND timestamp < ?)',
+                (expired_before, expired_before - default_duration)).rowcount
+
+            count, total_bytes = self._connection.execute(
+                'SELECT entries, bytes FROM totals').fetchone()
+            over_entries = count - max_entries if max_entries is not None else 0
+            over_bytes = total_bytes - max_bytes if max_bytes is not None else 0
+            if over_entries <= 0 and over_bytes <= 0:
+                return expired, 0
+
+            victims = []
+            for key, size in self._connection.execute(
+                    'SELECT key, size FROM cache ORDER BY accessed ASC'):
+                if over_entries <= 0 and over_bytes <= 0:
+                    break
+                victims.append((key,))
+                over_entries -= 1
+                over_bytes -= size
+            self._connection.executemany('DELETE FROM cache WHERE key = ?', victims)
+            return expired, len(victims)
+
+    def migrate_from_json(self, json_file: str) -> int:
+        """Import the entries of a legacy JSON cache file, then rename it.
+
+        Entries already present in the database are kept. The JSON file is
+        renamed to ``<name>.migrated`` so the import only happens once.
+        Returns the number of entries imported.
+        """
+        if not os.path.exists(json_file):
+            return 0
+
+        legacy = JSONFileBackend(json_file)._load()
+        rows = []
+        for key, entry in legacy.items():
+            try:
+                payload = json.dumps(JSONFileBackend._entry_data(entry))
+            except ValueError:
+                continue
+            rows.append((key, entry['timestamp'], payload, entry['timestamp'], len(payload)))
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO cache (key, timestamp, data, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+            imported = self._connection.total_changes - before
+
+        os.replace(json_file, f'{json_file}.migrated')
+        return imported
+
+    def close(self) -> None:
+        """Write the collected access times and close the database connection."""
+        with self._lock:
+            with self._connection:
+                self._write_accessed()
+            self._connection.close()
+
+
+_backends: Dict[str, Any] = {}
+_backends_lock = threading.Lock()
+
+
+def open_backend(cache_file: str):
+    """Return the backend for a cache file: SQLite for .db/.sqlite files, JSON otherwise.
+
+    Backends are shared per file within a process, so every CacheManager for
+    the same file uses one SQLite connection.
+    """
+    path = os.path.abspath(cache_file)
+    with _backends_lock:
+        backend = _backends.get(path)
+        if backend is None:
+            if cache_file.endswith(SQLITE_EXTENSIONS):
+                backend = SQLiteBackend(cache_file)
+            else:
+                backend = JSONFileBackend(cache_file)
+            _backends[path] = backend
+        return backend
+
+
+@atexit.register
+def _flush_all() -> None:
+    for backend in list(_backends.values()):
+        try:
+            backend.flush()
+        except sqlite3.Error:
+            pass
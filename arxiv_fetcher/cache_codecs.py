@@ -0,0 +1,52 @@
+"""Codecs used to serialize cache entries."""
+
+import json
+import zlib
+from typing import Any, Union
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install arxiv-fetcher[zstd]
+    zstandard = None
+
+CODECS = ('json', 'zlib', 'zstd')
+
+_DECODE_ERRORS = (zlib.error, json.JSONDecodeError, UnicodeDecodeError)
+if zstandard is not None:
+    _DECODE_ERRORS += (zstandard.ZstdError,)
+
+
+def check_codec(codec: str) -> str:
+    """Validate a codec name, falling back to zlib if zstandard is not installed."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown cache codec: {codec} (expected one of {', '.join(CODECS)})")
+    if codec == 'zstd' and zstandard is None:
+        return 'zlib'
+    return codec
+
+
+def encode(data: Any, codec: str) -> bytes:
+    """Serialize data to JSON and compress it with the given codec."""
+    payload = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    if codec == 'zlib':
+        return zlib.compress(payload)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(payload)
+    return payload
+
+
+def decode(payload: Union[str, bytes], codec: str) -> Any:
+    """Decompress and parse a payload written by ``encode``.
+
+    Raises ValueError if the payload is corrupt or its codec is unavailable.
+    """
+    try:
+        if codec == 'zlib':
+            payload = zlib.decompress(payload)
+        elif codec == 'zstd':
+            if zstandard is None:
+                raise ValueError("Entry is zstd-compressed but zstandard is not installed")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        return json.loads(payload)
+    except _DECODE_ERRORS as e:
+        raise ValueError(f"Corrupt cache entry: {str(e)}")
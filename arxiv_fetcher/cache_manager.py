@@ -1,45 +1,268 @@
 """Cache manager for storing API responses."""
 
-import json
-import time
-from typing import Optional, Dict, Any
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Any, Dict, Iterator, Tuple
+
+from .cache_backends import CacheEntry, SQLiteBackend, open_backend
+from .cache_codecs import check_codec
+from .cache_stats import get_cache_stats
+from .config import CACHE_MEMORY_ENTRIES, CACHE_PRUNE_INTERVAL, CACHE_PRUNE_WRITES
+from .file_lock import file_lock
+
+class MemoryTier:
+    """In-process LRU of recently used cache entries, layered over an on-disk backend.
+
+    The tier remembers the backend's version token from when it was last
+    validated and drops everything as soon as the token changes, i.e. when
+    another process has written to the cache (writes made by this process
+    leave the token unchanged). ``stats`` counts hits and misses for both
+    the memory and the disk tier, and ``write_lock`` serializes this
+    process's writes to the cache file.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.version: Any = None
+        self.stats = {
+            'memory': {'hits': 0, 'misses': 0},
+            'disk': {'hits': 0, 'misses': 0},
+        }
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.write_lock = threading.Lock()
+
+    def validate(self, version: Any) -> None:
+        """Drop all entries if the backend changed since the tier was last validated."""
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for a key, marking it as recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        """Store an entry, evicting the least recently used beyond max_entries."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def count(self, tier: str, outcome: str) -> None:
+        """Increment the hit or miss counter of a tier."""
+        with self._lock:
+            self.stats[tier][outcome] += 1
+
+
+# Shared per cache file so repeated CacheManager instances in one process reuse hot entries
+_memory_tiers: Dict[str, MemoryTier] = {}
+_memory_tiers_lock = threading.Lock()
+
+def get_memory_tier(cache_file: str, max_entries: int = CACHE_MEMORY_ENTRIES) -> MemoryTier:
+    """Return the process-wide memory tier for a cache file."""
+    path = os.path.abspath(cache_file)
+    with _memory_tiers_lock:
+        tier = _memory_tiers.get(path)
+        if tier is None:
+            tier = _memory_tiers[path] = MemoryTier(max_entries)
+        return tier
 
 class CacheManager:
-    def __init__(self, cache_file: str, cache_duration: int):
+    def __init__(self, cache_file: str, cache_duration: int, migrate_from: Optional[str] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None,
+                 max_staleness: int = 0, codec: str = 'json'):
+        """Initialize the cache.
+
+        Args:
+            cache_file: Cache location; files ending in .db/.sqlite use the
+                       SQLite backend, anything else a single JSON file
+            cache_duration: Seconds an entry stays valid
+            migrate_from: Optional legacy JSON cache file whose entries are
+                       imported into a SQLite cache on first use
+            max_entries: Optional bound on the number of entries kept
+            max_bytes: Optional bound on the total size of the stored data
+            max_staleness: Seconds past cache_duration that expired entries
+                       are kept for ``get_stale``
+            codec: How new entries are stored: 'json', or compressed with
+                       'zlib' or 'zstd' (falls back to zlib without the
+                       zstandard package). Entries remember their codec, so
+                       it can be changed without clearing the cache
+
+        Expired entries are removed, and the least recently used entries are
+        evicted to stay within the bounds, on the first write and then every
+        CACHE_PRUNE_WRITES writes or CACHE_PRUNE_INTERVAL seconds, so the
+        bounds can be overshot by that many writes in between.
+        Recently used entries are also kept in a process-wide memory tier,
+        so hot keys are served without reading the backend. Lookups and
+        writes are recorded per key prefix in ``usage`` (see cache_stats).
+        """
         self.cache_file = cache_file
         self.cache_duration = cache_duration
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_staleness = max_staleness
+        self.codec = check_codec(codec)
+        self.backend = open_backend(cache_file)
+        self.memory = get_memory_tier(cache_file)
+        self.usage = get_cache_stats(cache_file)
+        self._writes_since_prune = 0
+        self._last_prune: Optional[float] = None
+        self._prune_lock = threading.Lock()
+        if migrate_from and isinstance(self.backend, SQLiteBackend):
+            self.backend.migrate_from_json(migrate_from)
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache if it exists and is not expired."""
-        if not os.path.exists(self.cache_file):
+    @property
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit and miss counters for the memory and disk tiers of this cache file."""
+        return self.memory.stats
+
+    def _read(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for a key from memory, falling back to the backend."""
+        self.memory.validate(self.backend.version())
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory.count('memory', 'hits')
+            # Keep hot keys from being evicted from the backend as unused
+            self.backend.touch(key)
+            return entry
+        self.memory.count('memory', 'misses')
+
+        entry = self.backend.read(key)
+        if entry is None:
+            self.memory.count('disk', 'misses')
             return None
+        self.memory.count('disk', 'hits')
+        self.memory.put(key, entry)
+        return entry
+
+    def _expires(self, entry: CacheEntry) -> float:
+        """Return when an entry expires, falling back to the cache-wide duration."""
+        timestamp, _, expires, _ = entry
+        return expires if expires is not None else timestamp + self.cache_duration
+
+    def _record(self, key: str, outcome: str, started: float, entry: Optional[CacheEntry],
+                now: float) -> None:
+        """Record the outcome of a lookup that started at ``started`` (perf_counter)."""
+        seconds = time.perf_counter() - started
+        if entry is None or outcome not in ('hits', 'stale_hits'):
+            self.usage.record_read(key, outcome, seconds)
+        else:
+            self.usage.record_read(key, outcome, seconds, entry[3], now - entry[0])
 
-        try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                if key in cache:
-                    entry = cache[key]
-                    if time.time() - entry['timestamp'] < self.cache_duration:
-                        return entry['data']
-        except (json.JSONDecodeError, KeyError, TypeError):
+    def get(self, key: str, record: bool = True) -> Optional[Any]:
+        """Get value from cache if it exists and is not expired.
+
+        Pass record=False for repeated lookups, such as the re-check after
+        taking a fill lock, so they are not counted in the usage statistics.
+        """
+        started = time.perf_counter()
+        entry = self._read(key)
+        now = time.time()
+        if not record:
+            return entry[1] if entry is not None and now < self._expires(entry) else None
+        if entry is None:
+            self._record(key, 'misses', started, entry, now)
             return None
+        if now < self._expires(entry):
+            self._record(key, 'hits', started, entry, now)
+            return entry[1]
+        self._record(key, 'expired', started, entry, now)
         return None
 
-    def set(self, key: str, value: Any) -> None:
-        """Set value in cache with current timestamp."""
-        cache: Dict[str, Any] = {}
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    cache = json.load(f)
-            except json.JSONDecodeError:
-                pass
-
-        cache[key] = {
-            'timestamp': time.time(),
-            'data': value
-        }
+    def get_stale(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """Get value from cache even if it has expired, as long as it is within max_staleness.
+
+        Returns a (value, expired) tuple, or None if there is no usable entry.
+        """
+        started = time.perf_counter()
+        entry = self._read(key)
+        now = time.time()
+        if entry is None:
+            self._record(key, 'misses', started, entry, now)
+            return None
+        expires = self._expires(entry)
+        if now < expires:
+            self._record(key, 'hits', started, entry, now)
+            return entry[1], False
+        if now < expires + self.max_staleness:
+            self._record(key, 'stale_hits', started, entry, now)
+            return entry[1], True
+        self._record(key, 'expired', started, entry, now)
+        return None
+
+    def items(self, prefix: str = '') -> Iterator[Tuple[str, Any]]:
+        """Yield (key, value) for every unexpired entry whose key starts with prefix.
+
+        Entries are read straight from the backend, bypassing the memory tier
+        and the usage statistics.
+        """
+        now = time.time()
+        for key, entry in self.backend.entries(prefix):
+            if now < self._expires(entry):
+                yield key, entry[1]
+
+    def set(self, key: str, value: Any, duration: Optional[float] = None) -> None:
+        """Set value in cache with current timestamp.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            duration: Optional seconds this entry stays valid, overriding
+                     the cache-wide cache_duration
+        """
+        started = time.perf_counter()
+        timestamp = time.time()
+        expires = timestamp + duration if duration is not None else None
+        with self.memory.write_lock:
+            # The version is checked on both sides of the write, so a write by
+            # another process just before or during ours still clears the tier
+            self.memory.validate(self.backend.version())
+            size = self.backend.write(key, timestamp, value, expires, self.codec)
+            if self._prune_due():
+                self.prune()
+            self.memory.validate(self.backend.version())
+            self.memory.put(key, (timestamp, value, expires, size))
+        self.usage.record_write(key, time.perf_counter() - started, size)
+
+    @contextmanager
+    def fill_lock(self, key: str) -> Iterator[None]:
+        """Hold a lock that serializes refilling one key across processes and threads.
+
+        Callers that miss should take the lock, check the cache again and only
+        fetch if it is still missing, so parallel workers wait for the first
+        one's result instead of all fetching the same data.
+        """
+        # One lock file per cache; each key locks its own byte in it
+        offset = 1 + int(hashlib.sha1(key.encode('utf-8')).hexdigest()[:7], 16)
+        with file_lock(f'{self.cache_file}.fill.lock', offset):
+            yield
+
+    def _prune_due(self) -> bool:
+        """Count a write and return whether it is time to prune."""
+        with self._prune_lock:
+            self._writes_since_prune += 1
+            if (self._last_prune is not None
+                    and self._writes_since_prune < CACHE_PRUNE_WRITES
+                    and time.monotonic() - self._last_prune < CACHE_PRUNE_INTERVAL):
+                return False
+            self._writes_since_prune = 0
+            self._last_prune = time.monotonic()
+            return True
 
-        with open(self.cache_file, 'w', encoding='utf-8') as f:
-            json.dump(cache, f)
+    def prune(self) -> Dict[str, int]:
+        """Remove entries past their staleness bound and evict entries beyond the size bounds."""
+        expired_before = time.time() - self.max_staleness
+        expired, evicted = self.backend.prune(expired_before, self.cache_duration,
+                                              self.max_entries, self.max_bytes)
+        return {'expired': expired, 'evicted': evicted}
@@ -0,0 +1,150 @@
+"""Usage statistics for CacheManager, kept per key prefix and persisted next to the cache."""
+
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict
+
+from .cache_backends import write_json_atomic
+from .file_lock import file_lock
+
+# Counters kept for every key prefix
+COUNTERS = (
+    'hits',             # fresh entries served
+    'stale_hits',       # expired entries served by get_stale
+    'misses',           # keys with no entry
+    'expired',          # entries found but too old to serve
+    'writes',
+    'bytes_read',       # stored payload bytes of the entries served
+    'bytes_written',
+    'read_seconds',     # time spent in lookups, including misses
+    'write_seconds',    # time spent writing and pruning
+    'hit_age_seconds',  # summed age of the entries served
+)
+
+
+def key_prefix(key: str) -> str:
+    """Return the prefix statistics are grouped by, e.g. 'papers' for 'papers_cs.AI_2024-01-08'."""
+    return key.split('_', 1)[0]
+
+
+def _empty_counters() -> Dict[str, float]:
+    return {name: 0 for name in COUNTERS}
+
+
+class CacheStats:
+    """Counts cache hits, misses, expirations, latency and payload sizes per key prefix.
+
+    Counts are collected in memory and added to ``<cache_file>.stats.json``
+    by ``flush``, which runs automatically when the process exits. The file
+    is updated under a lock, so the totals of parallel processes add up.
+    """
+
+    def __init__(self, stats_file: str):
+        self.stats_file = stats_file
+        self._pending: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, key: str, **amounts: float) -> None:
+        with self._lock:
+            counters = self._pending.setdefault(key_prefix(key), _empty_counters())
+            for name, amount in amounts.items():
+                counters[name] += amount
+
+    def record_read(self, key: str, outcome: str, seconds: float, size: int = 0,
+                    age: float = 0) -> None:
+        """Record a lookup; outcome is 'hits', 'stale_hits', 'misses' or 'expired'."""
+        if outcome in ('hits', 'stale_hits'):
+            self._add(key, **{outcome: 1}, read_seconds=seconds, bytes_read=size,
+                      hit_age_seconds=age)
+        else:
+            self._add(key, **{outcome: 1}, read_seconds=seconds)
+
+    def record_write(self, key: str, seconds: float, size: int) -> None:
+        """Record a write of a payload of the given size."""
+        self._add(key, writes=1, write_seconds=seconds, bytes_written=size)
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.stats_file):
+            return {'since': None, 'prefixes': {}}
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {'since': None, 'prefixes': {}}
+
+    def flush(self) -> None:
+        """Add the counts collected since the last flush to the stats file."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        with file_lock(f'{self.stats_file}.lock'):
+            stats = self._load()
+            stats['since'] = stats.get('since') or datetime.now().isoformat()
+            for prefix, counters in pending.items():
+                totals = stats['prefixes'].setdefault(prefix, _empty_counters())
+                for name, amount in counters.items():
+                    totals[name] = totals.get(name, 0) + amount
+            write_json_atomic(self.stats_file, stats)
+
+    def reset(self) -> None:
+        """Discard all recorded statistics."""
+        with self._lock:
+            self._pending = {}
+        with file_lock(f'{self.stats_file}.lock'):
+            if os.path.exists(self.stats_file):
+                os.remove(self.stats_file)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the persisted totals plus unflushed counts, with derived rates.
+
+        The result has ``since`` (when recording started) and ``prefixes``,
+        mapping each key prefix to its counters and ``hit_rate``,
+        ``avg_read_ms``, ``avg_write_ms`` and ``avg_hit_age_seconds``.
+        """
+        stats = self._load()
+        prefixes = {prefix: {**_empty_counters(), **counters}
+                    for prefix, counters in stats['prefixes'].items()}
+        with self._lock:
+            for prefix, counters in self._pending.items():
+                totals = prefixes.setdefault(prefix, _empty_counters())
+                for name, amount in counters.items():
+                    totals[name] += amount
+
+        for counters in prefixes.values():
+            served = counters['hits'] + counters['stale_hits']
+            lookups = served + counters['misses'] + counters['expired']
+            counters['hit_rate'] = served / lookups if lookups else 0.0
+            counters['avg_read_ms'] = (1000 * counters['read_seconds'] / lookups
+                                       if lookups else 0.0)
+            counters['avg_write_ms'] = (1000 * counters['write_seconds'] / counters['writes']
+                                        if counters['writes'] else 0.0)
+            counters['avg_hit_age_seconds'] = (counters['hit_age_seconds'] / served
+                                               if served else 0.0)
+        return {'since': stats.get('since'), 'prefixes': prefixes}
+
+
+# Shared per cache file, like the memory tier, and flushed when the process exits
+_cache_stats: Dict[str, CacheStats] = {}
+_cache_stats_lock = threading.Lock()
+
+def get_cache_stats(cache_file: str) -> CacheStats:
+    """Return the process-wide statistics collector for a cache file."""
+    path = os.path.abspath(cache_file)
+    with _cache_stats_lock:
+        stats = _cache_stats.get(path)
+        if stats is None:
+            stats = _cache_stats[path] = CacheStats(f'{path}.stats.json')
+        return stats
+
+@atexit.register
+def _flush_all() -> None:
+    for stats in list(_cache_stats.values()):
+        try:
+            stats.flush()
+        except OSError:
+            pass
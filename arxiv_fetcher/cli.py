@@ -1,33 +1,144 @@
 """Command line interface for the ArXiv paper fetcher."""
 
+import os
 import sys
+import json
 import argparse
-from typing import Optional, List
-from datetime import datetime
+import subprocess
+from typing import TYPE_CHECKING, Dict, Optional, List, Set
+from datetime import date, datetime, timedelta, timezone
 
-from .config import (CACHE_FILE, CACHE_DURATION, MAX_RESULTS, 
-                          ARXIV_CATEGORIES)
-from .cache_manager import CacheManager
-from .arxiv_client import ArxivClient
-from .formatter import PaperFormatter
-from .exporters import export_to_json, export_to_csv
-from .paper_analyzer import analyze_papers
-from .paper_downloader import PaperDownloader
-from .paper_summarizer import PaperSummarizer
+from .config import (CACHE_FILE, CACHE_DURATION, CACHE_MAX_BYTES, CACHE_MAX_ENTRIES,
+                          CACHE_MAX_STALENESS, CACHE_CODEC,
+                          LEGACY_CACHE_FILE, MAX_RESULTS, 
+                          ARXIV_CATEGORIES, FETCH_CONCURRENCY, DEFAULT_CATEGORY,
+                          INCREMENTAL_STATE_FILE, ANALYSIS_CONCURRENCY, ANALYSIS_PACK_SIZE,
+                          ANALYSIS_CACHE_FILE, ANALYSIS_CACHE_DURATION,
+                          ANALYSIS_CACHE_MAX_ENTRIES, ANALYSIS_CACHE_MAX_BYTES,
+                          PREFILTER_FILE, PREFILTER_TARGET_RECALL)
+
+# Each subcommand imports the modules it needs when it runs, so that e.g.
+# `arxiv-fetch categories` does not load openai or the fetch stack
+if TYPE_CHECKING:
+    from .arxiv_client import ArxivClient
+    from .cache_manager import CacheManager
 
 
 def validate_days(days: int) -> bool:
     """Validate the number of days input."""
     return 1 <= days <= 30
 
-def get_cache_key(days: int, categories: list = None) -> str:
-    """Generate cache key based on parameters."""
-    cat_str = "_".join(str(c) for c in categories) if categories else "default"
-    return f"papers_{days}_{cat_str}_{datetime.now().strftime('%Y-%m-%d')}"
+def get_cache_manager() -> 'CacheManager':
+    """Create the fetch cache with the configured location and bounds."""
+    from .cache_manager import CacheManager
+    return CacheManager(CACHE_FILE, CACHE_DURATION, migrate_from=LEGACY_CACHE_FILE,
+                        max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                        max_staleness=CACHE_MAX_STALENESS, codec=CACHE_CODEC)
+
+def get_analysis_cache() -> 'CacheManager':
+    """Create the cache of paper analyses, kept apart from the fetch cache."""
+    from .cache_manager import CacheManager
+    return CacheManager(ANALYSIS_CACHE_FILE, ANALYSIS_CACHE_DURATION,
+                        max_entries=ANALYSIS_CACHE_MAX_ENTRIES,
+                        max_bytes=ANALYSIS_CACHE_MAX_BYTES, codec=CACHE_CODEC)
+
+# Caches that `cache prune` and `cache stats` can act on, by --cache name
+CACHES = {'fetch': get_cache_manager, 'analysis': get_analysis_cache}
+
+def get_category_tuples(categories: Optional[List[List[str]]]) -> List[tuple]:
+    """Convert --categories argument groups into (cat1, cat2, operator) tuples."""
+    category_tuples = []
+    if categories:
+        for cats in categories:
+            if len(cats) == 1:
+                category_tuples.append((cats[0], None, 'AND'))
+            elif len(cats) == 2:
+                category_tuples.append((cats[0], cats[1], 'AND'))
+            else:
+                category_tuples.append((cats[0], cats[1], cats[2].upper()))
+    return category_tuples or [(DEFAULT_CATEGORY, None, 'AND')]
+
+def fetch_incremental(arxiv_client: 'ArxivClient', days: int, category_tuples: List[tuple],
+                      concurrency: int) -> List[dict]:
+    """Fetch only papers newer than each combo's stored watermark and merge them into the stored results.
+
+    A combo without a watermark inside the window gets its newest
+    MAX_RESULTS papers. The others get every paper since their watermark,
+    however many, as the watermark then moves to the newest one and papers
+    left out would never be fetched.
+    """
+    from .incremental_store import IncrementalStore
+    from .query_planner import normalize_combo
+    store = IncrementalStore(INCREMENTAL_STATE_FILE)
+    combos = [normalize_combo(combo) for combo in category_tuples]
+    window_start = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    since = {}
+    for combo in combos:
+        watermark = store.watermark(combo)
+        if watermark and watermark >= window_start:
+            since[combo] = watermark
+
+    new_papers = {}
+    first_runs = [combo for combo in combos if combo not in since]
+    if first_runs:
+        new_papers.update(arxiv_client.fetch_papers_by_combo(
+            days, MAX_RESULTS, first_runs, concurrency))
+    if since:
+        new_papers.update(arxiv_client.fetch_papers_by_combo(
+            days, None, list(since), concurrency, since))
+
+    papers_by_id = {}
+    for combo in combos:
+        for paper in store.merge(combo, new_papers[combo], window_start):
+            papers_by_id.setdefault(arxiv_client.paper_id(paper), paper)
+    store.save()
+
+    return sorted(papers_by_id.values(), key=lambda paper: paper.published_at, reverse=True)
+
+def refresh_in_background(stale: Dict[tuple, Set[date]], concurrency: int) -> None:
+    """Start a detached process that refreshes the given stale day slices.
+
+    The process outlives this one, so the command returns as soon as the
+    stale results are shown. Its output is discarded; if the refresh fails,
+    the stale slices simply stay in use until the next one.
+    """
+    slices = [[*combo, day.isoformat()] for combo, days in stale.items() for day in sorted(days)]
+    command = [sys.executable, '-m', 'arxiv_fetcher.cli', 'cache', 'refresh',
+               '--slices', json.dumps(slices), '--concurrency', str(concurrency)]
+    options = {}
+    if os.name == 'nt':
+        options['creationflags'] = (subprocess.DETACHED_PROCESS
+                                    | subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        options['start_new_session'] = True
+    subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, **options)
+
+def print_scan_summary(stats: Dict[str, int]) -> None:
+    """Print how much of arXiv's results a fetch read and skipped, if it sent any queries."""
+    if not stats['pages_fetched']:
+        return
+    print(f"arXiv scan: queries planned {stats['queries_planned']}, "
+          f"pages read {stats['pages_fetched']}, entries parsed {stats['entries_parsed']}, "
+          f"duplicates merged {stats['duplicates_merged']}, skipped past the date window "
+          f"{stats['entries_skipped']} entries ({stats['pages_skipped']} pages)")
 
 def run_fetcher(days: Optional[int] = None, categories: Optional[List[List[str]]] = None, 
-                export_json: Optional[str] = None, export_csv: Optional[str] = None) -> None:
-    """Main function to fetch and display papers."""
+                export_json: Optional[str] = None, export_csv: Optional[str] = None,
+                concurrency: int = FETCH_CONCURRENCY, incremental: bool = False,
+                stale_while_revalidate: bool = False) -> None:
+    """Main function to fetch and display papers.
+
+    With stale_while_revalidate, expired cached day slices that are at most
+    CACHE_MAX_STALENESS seconds past their expiry are used immediately
+    while a detached background process refreshes them.
+    """
+    from .arxiv_client import ArxivClient
+    from .exporters import export_to_csv, export_to_json
+    from .formatter import PaperFormatter
+    from .response_cache import ResponseCache
+    from .slice_cache import SliceCache
+
     # Use provided days or default
     actual_days = days or 7
 
@@ -37,32 +148,26 @@ def run_fetcher(days: Optional[int] = None, categories: Optional[List[List[str]]
         sys.exit(1)
 
     # Initialize components
-    cache_manager = CacheManager(CACHE_FILE, CACHE_DURATION)
-    arxiv_client = ArxivClient()
     formatter = PaperFormatter()
 
     try:
-        # Check cache first
-        cache_key = get_cache_key(actual_days, categories)
-        cached_data = cache_manager.get(cache_key)
-
-        if cached_data is None:
-            # Fetch new data if not in cache
-            # Process category combinations
-            category_tuples = []
-            if categories:
-                for cats in categories:
-                    if len(cats) == 1:
-                        category_tuples.append((cats[0], None, 'AND'))
-                    elif len(cats) == 2:
-                        category_tuples.append((cats[0], cats[1], 'AND'))
-                    else:
-                        category_tuples.append((cats[0], cats[1], cats[2].upper()))
-            
-            papers = arxiv_client.fetch_papers(actual_days, MAX_RESULTS, category_tuples)
-            cache_manager.set(cache_key, papers)
+        category_tuples = get_category_tuples(categories)
+
+        if incremental:
+            # Incremental runs keep their own state instead of the response
+            # cache; their queries end at the current minute, so responses
+            # would never be reused
+            arxiv_client = ArxivClient()
+            papers = fetch_incremental(arxiv_client, actual_days, category_tuples, concurrency)
         else:
-            papers = cached_data
+            # Assemble the results from cached per-day slices, fetching only missing days
+            cache_manager = get_cache_manager()
+            arxiv_client = ArxivClient(response_cache=ResponseCache(cache_manager))
+            slice_cache = SliceCache(cache_manager, arxiv_client, stale_while_revalidate)
+            papers = slice_cache.fetch(actual_days, category_tuples, MAX_RESULTS, concurrency)
+            if slice_cache.stale:
+                print("Showing expired cached results; refreshing them in the background")
+                refresh_in_background(slice_cache.stale, concurrency)
 
         # Export if requested
         if export_json:
@@ -77,20 +182,83 @@ def run_fetcher(days: Optional[int] = None, categories: Optional[List[List[str]]
         if not (export_json or export_csv):
             formatter.display_papers(papers)
 
+        print_scan_summary(arxiv_client.scan_stats)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+def run_harvester(set_spec: str, output_file: str, from_date: Optional[str] = None,
+                  until_date: Optional[str] = None, categories: Optional[List[List[str]]] = None,
+                  recordings: Optional[str] = None, record: bool = False) -> None:
+    """Harvest paper metadata in bulk via OAI-PMH and stream it to a JSON file."""
+    from .exporters import stream_to_json
+    from .http_pool import get_default_pool
+    from .oai_harvester import OAIHarvester, RecordedResponses
+    from .rate_limiter import RateLimiter
+    try:
+        transport = rate_limiter = None
+        if recordings:
+            transport = RecordedResponses(recordings, get_default_pool() if record else None)
+            if not record:
+                # Replaying never touches arXiv, so there is nothing to throttle
+                rate_limiter = RateLimiter(0)
+        harvester = OAIHarvester(transport=transport, rate_limiter=rate_limiter)
+        papers = harvester.iter_records(
+            set_spec,
+            date.fromisoformat(from_date) if from_date else None,
+            date.fromisoformat(until_date) if until_date else None,
+            get_category_tuples(categories) if categories else None
+        )
+        paper_count = stream_to_json(papers, output_file)
+        print(f"Harvested {paper_count} papers in {harvester.stats['requests']} requests: {output_file}")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+def run_analyzer(input_file: str, output_file: str, min_relevance_score: float,
+                 concurrency: int = ANALYSIS_CONCURRENCY, use_cache: bool = True,
+                 batch: bool = False, pack_size: int = ANALYSIS_PACK_SIZE,
+                 use_prefilter: bool = False) -> None:
+    """Run the paper analyzer on the input file, reusing cached analyses unless use_cache is False."""
+    from .paper_analyzer import analyze_papers
+    try:
+        cache_manager = get_analysis_cache() if use_cache else None
+        prefilter = None
+        if use_prefilter:
+            from .prefilter import RelevancePrefilter
+            if not os.path.exists(PREFILTER_FILE):
+                raise Exception(f"No prefilter found at {PREFILTER_FILE}; "
+                                "train one with 'arxiv-fetch prefilter train'")
+            prefilter = RelevancePrefilter.load(PREFILTER_FILE)
+        analyze_papers(input_file, output_file, min_relevance_score, concurrency, cache_manager,
+                       batch, pack_size, prefilter)
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
 
-def run_analyzer(input_file: str, output_file: str, min_relevance_score: float) -> None:
-    """Run the paper analyzer on the input file."""
+def run_prefilter_train(min_relevance_score: float, target_recall: float) -> None:
+    """Train the relevance prefilter on the cached analyses and save it."""
+    from .prefilter import RelevancePrefilter
+    if not 0 < target_recall <= 1:
+        print("Error: Target recall must be above 0 and at most 1")
+        sys.exit(1)
     try:
-        analyze_papers(input_file, output_file, min_relevance_score)
+        prefilter = RelevancePrefilter.train_from_cache(get_analysis_cache(), min_relevance_score,
+                                                        target_recall)
+        prefilter.save(PREFILTER_FILE)
+        info = prefilter.info
+        print(f"Prefilter trained on {info['examples']} analyzed papers ({info['relevant']} relevant): "
+              f"{PREFILTER_FILE}")
+        print(f"In cross-validation it kept {info['cv_recall']:.1%} of the relevant papers "
+              f"and skipped {info['cv_skip_rate']:.1%} of all papers.")
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
 
 def run_downloader(input_file: str, output_dir: str) -> None:
     """Run the paper downloader on the analyzed papers."""
+    from .paper_downloader import PaperDownloader
     try:
         downloader = PaperDownloader(output_dir)
         downloader.download_papers(input_file)
@@ -109,6 +277,7 @@ def run_parser(titles: Optional[list] = None, date: Optional[str] = None) -> Non
 
 def run_summarizer(titles: Optional[list] = None, date: Optional[str] = None) -> None:
     """Run the paper summarizer with specified titles or date."""
+    from .paper_summarizer import PaperSummarizer
     try:
         summarizer = PaperSummarizer()
         summarizer.process_papers(titles=titles, date=date)
@@ -116,8 +285,50 @@ def run_summarizer(titles: Optional[list] = None, date: Optional[str] = None) ->
         print(f"Error: {str(e)}")
         sys.exit(1)
 
+def run_cache_prune(cache: str = 'fetch') -> None:
+    """Remove expired entries from the fetch or analysis cache and enforce its size bounds."""
+    try:
+        removed = CACHES[cache]().prune()
+        print(f"{cache.capitalize()} cache pruned: {removed['expired']} expired and "
+              f"{removed['evicted']} least recently used entries removed")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+def run_cache_refresh(slices: str, concurrency: int = FETCH_CONCURRENCY) -> None:
+    """Refetch day slices given as a JSON list of [cat1, cat2, operator, day] items."""
+    from .arxiv_client import ArxivClient
+    from .response_cache import ResponseCache
+    from .slice_cache import SliceCache
+    try:
+        stale = {}
+        for cat1, cat2, operator, day in json.loads(slices):
+            stale.setdefault((cat1, cat2, operator), set()).add(date.fromisoformat(day))
+        cache_manager = get_cache_manager()
+        arxiv_client = ArxivClient(response_cache=ResponseCache(cache_manager))
+        SliceCache(cache_manager, arxiv_client).fetch_slices(stale, MAX_RESULTS, concurrency)
+        print(f"Refreshed {sum(len(days) for days in stale.values())} cached day slices")
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
+def run_cache_stats(reset: bool = False, cache: str = 'fetch') -> None:
+    """Display the recorded statistics of the fetch or analysis cache, or clear them."""
+    from .formatter import PaperFormatter
+    try:
+        usage = CACHES[cache]().usage
+        if reset:
+            usage.reset()
+            print(f"{cache.capitalize()} cache statistics cleared")
+            return
+        PaperFormatter().display_cache_stats(usage.report())
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+
 def display_categories() -> None:
     """Display all available arXiv categories."""
+    from .formatter import PaperFormatter
     formatter = PaperFormatter()
     formatter.display_categories(ARXIV_CATEGORIES)
 
@@ -137,6 +348,33 @@ def main() -> None:
                           help='Export papers to JSON file')
     fetch_parser.add_argument('--export-csv', type=str, metavar='FILENAME',
                           help='Export papers to CSV file')
+    fetch_parser.add_argument('--concurrency', type=int, default=FETCH_CONCURRENCY,
+                          help='Number of category combinations fetched in parallel')
+    fetch_parser.add_argument('--incremental', action='store_true',
+                          help='Only fetch papers newer than the last run and merge them '
+                               'into the stored results')
+    fetch_parser.add_argument('--stale-while-revalidate', action='store_true',
+                          help='Show expired cached results immediately (up to a day past '
+                               'expiry) and refresh them in the background')
+
+    # Harvest command
+    harvest_parser = subparsers.add_parser('harvest',
+                                         help='Bulk-harvest paper metadata via OAI-PMH for backfills')
+    harvest_parser.add_argument('--set', type=str, default='cs', dest='set_spec',
+                              help='OAI-PMH set to harvest (default: cs)')
+    harvest_parser.add_argument('--from', type=str, dest='from_date', metavar='YYYY-MM-DD',
+                              help='Earliest record datestamp')
+    harvest_parser.add_argument('--until', type=str, dest='until_date', metavar='YYYY-MM-DD',
+                              help='Latest record datestamp')
+    harvest_parser.add_argument('--categories', nargs='+', action='append',
+                              metavar='CATEGORY',
+                              help='Only keep papers matching these category combinations')
+    harvest_parser.add_argument('--output', type=str, required=True,
+                              help='Output JSON file for harvested papers')
+    harvest_parser.add_argument('--recordings', type=str, metavar='DIR',
+                              help='Replay recorded OAI-PMH responses from DIR instead of the network')
+    harvest_parser.add_argument('--record', action='store_true',
+                              help='With --recordings, fetch and save responses that are not recorded yet')
 
     # Analyze command
     analyze_parser = subparsers.add_parser('analyze', 
@@ -147,6 +385,22 @@ def main() -> None:
                               help='Output JSON file for analyzed papers')
     analyze_parser.add_argument('--min-relevance', type=float, default=0.7,
                               help='Minimum relevance score (0-1)')
+    analyze_parser.add_argument('--concurrency', type=int, default=ANALYSIS_CONCURRENCY,
+                              help='Maximum number of papers analyzed in parallel '
+                                   f'(default: {ANALYSIS_CONCURRENCY}); lowered automatically '
+                                   'when the API rate limits requests')
+    analyze_parser.add_argument('--no-cache', action='store_true',
+                              help='Analyze every paper again instead of reusing cached analyses')
+    analyze_parser.add_argument('--batch', action='store_true',
+                              help='Submit the analyses as an OpenAI Batch API job and wait for it; '
+                                   'cheaper with higher quotas, for runs that need not be interactive')
+    analyze_parser.add_argument('--pack-size', type=int, default=ANALYSIS_PACK_SIZE,
+                              help='Number of papers analyzed per request (default: '
+                                   f'{ANALYSIS_PACK_SIZE}); packing shares the instructions '
+                                   'between papers, with single-paper retries for malformed results')
+    analyze_parser.add_argument('--prefilter', action='store_true',
+                              help='Skip papers the local prefilter predicts to be irrelevant '
+                                   "before calling the API (train it with 'prefilter train')")
 
     # Download command
     download_parser = subparsers.add_parser('download',
@@ -172,12 +426,51 @@ def main() -> None:
     # Categories command
     subparsers.add_parser('categories', help='List all available arXiv categories')
 
+    # Cache command
+    cache_parser = subparsers.add_parser('cache', help='Manage the fetch and analysis caches')
+    cache_subparsers = cache_parser.add_subparsers(dest='cache_command', help='Cache commands')
+    prune_parser = cache_subparsers.add_parser(
+        'prune', help='Remove expired entries and enforce size bounds')
+    prune_parser.add_argument('--cache', choices=sorted(CACHES), default='fetch',
+                              help='Cache to prune (default: fetch)')
+    refresh_parser = cache_subparsers.add_parser(
+        'refresh', help='Refetch expired day slices (started by fetch --stale-while-revalidate)')
+    refresh_parser.add_argument('--slices', type=str, required=True,
+                                help='JSON list of [cat1, cat2, operator, YYYY-MM-DD] slices')
+    refresh_parser.add_argument('--concurrency', type=int, default=FETCH_CONCURRENCY,
+                                help='Number of category combinations fetched in parallel')
+    stats_parser = cache_subparsers.add_parser(
+        'stats', help='Show hits, misses, expirations, latency and sizes per key prefix')
+    stats_parser.add_argument('--reset', action='store_true',
+                              help='Clear the recorded statistics')
+    stats_parser.add_argument('--cache', choices=sorted(CACHES), default='fetch',
+                              help='Cache to show the statistics of (default: fetch)')
+
+    # Prefilter command
+    prefilter_parser = subparsers.add_parser(
+        'prefilter', help='Manage the local relevance prefilter used by analyze --prefilter')
+    prefilter_subparsers = prefilter_parser.add_subparsers(dest='prefilter_command',
+                                                           help='Prefilter commands')
+    train_parser = prefilter_subparsers.add_parser(
+        'train', help='Train the prefilter on the cached analyses')
+    train_parser.add_argument('--min-relevance', type=float, default=0.7,
+                              help='Lowest minimum relevance score (0-1) the prefilter is used with')
+    train_parser.add_argument('--target-recall', type=float, default=PREFILTER_TARGET_RECALL,
+                              help='Share of relevant papers the prefilter should keep in '
+                                   'cross-validation, above 0 and at most 1 '
+                                   f'(default: {PREFILTER_TARGET_RECALL})')
+
     args = parser.parse_args()
 
     if args.command == 'fetch':
-        run_fetcher(args.days, args.categories, args.export_json, args.export_csv)
+        run_fetcher(args.days, args.categories, args.export_json, args.export_csv,
+                    args.concurrency, args.incremental, args.stale_while_revalidate)
+    elif args.command == 'harvest':
+        run_harvester(args.set_spec, args.output, args.from_date, args.until_date,
+                      args.categories, args.recordings, args.record)
     elif args.command == 'analyze':
-        run_analyzer(args.input, args.output, args.min_relevance)
+        run_analyzer(args.input, args.output, args.min_relevance, args.concurrency,
+                     not args.no_cache, args.batch, args.pack_size, args.prefilter)
     elif args.command == 'download':
         run_downloader(args.input, args.output_dir)
     elif args.command == 'parse':
@@ -186,6 +479,14 @@ def main() -> None:
         run_summarizer(args.titles, args.date)
     elif args.command == 'categories':
         display_categories()
+    elif args.command == 'cache' and args.cache_command == 'prune':
+        run_cache_prune(args.cache)
+    elif args.command == 'cache' and args.cache_command == 'refresh':
+        run_cache_refresh(args.slices, args.concurrency)
+    elif args.command == 'cache' and args.cache_command == 'stats':
+        run_cache_stats(args.reset, args.cache)
+    elif args.command == 'prefilter' and args.prefilter_command == 'train':
+        run_prefilter_train(args.min_relevance, args.target_recall)
     else:
         parser.print_help()
         sys.exit(1)
@@ -47,14 +47,66 @@ ARXIV_CATEGORIES = {
 # API Settings
 ARXIV_API_URL = "http://export.arxiv.org/api/query"
 API_DELAY = 3  # seconds between requests
-MAX_RESULTS = 100
+FETCH_CONCURRENCY = 4  # category combinations fetched in parallel
+MAX_RESULTS = 100  # per category combination, across all pages
+PAGE_SIZE = 200  # entries requested per page when paging through results
+SUBMITTED_DATE_FORMAT = "%Y%m%d%H%M"  # format of submittedDate range bounds
+
+# OAI-PMH bulk harvesting settings
+OAI_PMH_URL = "https://oaipmh.arxiv.org/oai"
+OAI_METADATA_PREFIX = "arXiv"
+OAI_MAX_RETRIES = 5  # retries of a request answered with 503 Retry-After
+
+# HTTP settings
+ARXIV_PDF_URL = "https://arxiv.org/pdf"
+HTTP_POOL_SIZE = 4  # idle keep-alive connections kept per host
+HTTP_TIMEOUT = 30  # seconds
+USER_AGENT = "arxiv-fetcher/1.0"
+
+# Analysis settings
+ANALYSIS_CONCURRENCY = 8  # papers analyzed in parallel; lowered automatically on HTTP 429
+ANALYSIS_MAX_RETRIES = 5  # retries of an analysis request after a 429, 5xx, timeout or connection error
+ANALYSIS_BACKOFF = 2  # seconds before the first retry when the server sends no Retry-After
+ANALYSIS_PACK_SIZE = 1  # papers per analysis request; larger packs share one instruction block
+ANALYSIS_BATCH_POLL_INTERVAL = 30  # seconds between status checks of an analyze --batch job
+ANALYSIS_BATCH_MAX_REQUESTS = 50000  # requests per Batch API job, the API's limit per input file
+ANALYSIS_BATCH_STATE_FILE = ".arxiv_batches.json"  # submitted batches whose results a rerun can resume
+ANALYSIS_BATCH_RESUME_WINDOW = 30 * 24 * 3600  # how long a saved batch is resumed before its requests are resubmitted
+ANALYSIS_CACHE_FILE = ".arxiv_analysis_cache.db"  # analyses by content hash, apart from the fetch cache
+ANALYSIS_CACHE_DURATION = 180 * 24 * 3600  # prompt or model changes alter the key, so analyses keep long
+ANALYSIS_CACHE_MAX_ENTRIES = 100000  # least recently used analyses are evicted beyond this
+ANALYSIS_CACHE_MAX_BYTES = 200 * 1024 * 1024  # bound on the total size of cached analyses
+
+# Relevance prefilter settings
+PREFILTER_FILE = ".arxiv_prefilter.json"  # model trained by `prefilter train`, used by `analyze --prefilter`
+PREFILTER_TARGET_RECALL = 0.98  # share of relevant papers (in cross-validation) the prefilter must keep
+PREFILTER_MIN_EXAMPLES = 20  # relevant and other analyses needed, each, to train the prefilter
+PREFILTER_FEATURES = 2 ** 18  # hash buckets for the word features of titles and summaries
+PREFILTER_FOLDS = 5  # cross-validation folds used to choose the threshold, and models averaged
+PREFILTER_EPOCHS = 5  # passes of stochastic gradient descent over the training analyses
 
 # Default category if none specified
 DEFAULT_CATEGORY = "cs.CY"
 
 # Cache settings
 CACHE_DURATION = 3600  # 1 hour in seconds
-CACHE_FILE = ".arxiv_cache.json"
+CACHE_FILE = ".arxiv_cache.db"  # .db/.sqlite uses SQLite, any other name a JSON file
+LEGACY_CACHE_FILE = ".arxiv_cache.json"  # imported into CACHE_FILE on first use
+CACHE_MAX_ENTRIES = 1000  # least recently used entries are evicted beyond this
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # bound on the total size of cached data
+CACHE_PRUNE_WRITES = 100  # writes between automatic prunes of a cache
+CACHE_PRUNE_INTERVAL = 60  # seconds after which the next write prunes anyway
+CACHE_ACCESS_BATCH = 256  # cache reads whose access times are written together
+CACHE_MEMORY_ENTRIES = 128  # entries kept in the in-process LRU in front of the cache file
+CACHE_MAX_STALENESS = 24 * 3600  # how long past CACHE_DURATION --stale-while-revalidate may serve an entry
+CACHE_SETTLED_DAYS = 3  # day slices older than this are final, since arXiv has announced them
+CACHE_SETTLED_DURATION = 30 * 24 * 3600  # how long settled day slices stay cached
+HTTP_CACHE_FRESHNESS = 600  # seconds a cached API response is reused without revalidating it
+HTTP_CACHE_RETENTION = 7 * 24 * 3600  # how long API responses are kept for conditional revalidation
+CACHE_CODEC = "zstd"  # json, zlib or zstd (zstd needs the zstandard package, else zlib is used)
+
+# Incremental fetch settings
+INCREMENTAL_STATE_FILE = ".arxiv_incremental.json"
 
 # Output settings
 MAX_ABSTRACT_LENGTH = 500
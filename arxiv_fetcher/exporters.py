@@ -2,9 +2,11 @@
 
 import json
 import csv
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 from datetime import datetime
 
+from .paper import as_dict, as_dicts
+
 def export_to_json(papers: List[Dict[str, Any]], output_file: str) -> None:
     """Export papers data to JSON file."""
     # Ensure the filename has .json extension
@@ -18,9 +20,36 @@ def export_to_json(papers: List[Dict[str, Any]], output_file: str) -> None:
                 'paper_count': len(papers),
                 'export_format_version': '1.0'
             },
-            'papers': papers
+            'papers': as_dicts(papers)
         }, f, indent=2, ensure_ascii=False)
 
+def stream_to_json(papers: Iterable[Dict[str, Any]], output_file: str) -> int:
+    """Write papers to a JSON file one at a time, without holding them in memory.
+
+    The file has the same layout as ``export_to_json``, with the metadata
+    written after the papers once the count is known. Returns the number of
+    papers written.
+    """
+    # Ensure the filename has .json extension
+    if not output_file.endswith('.json'):
+        output_file += '.json'
+
+    paper_count = 0
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write('{\n  "papers": [')
+        for paper in papers:
+            f.write(',\n    ' if paper_count else '\n    ')
+            json.dump(as_dict(paper), f, ensure_ascii=False)
+            paper_count += 1
+        f.write('\n  ],\n  "metadata": ')
+        json.dump({
+            'exported_at': datetime.now().isoformat(),
+            'paper_count': paper_count,
+            'export_format_version': '1.0'
+        }, f)
+        f.write('\n}\n')
+    return paper_count
+
 def export_to_csv(papers: List[Dict[str, Any]], output_file: str) -> None:
     """Export papers data to CSV file."""
     # Ensure the filename has .csv extension
@@ -0,0 +1,357 @@
+"""Local stand-in for the OpenAI chat completions and Batch APIs, for running `analyze` offline.
+
+Start it and point the OpenAI client at it::
+
+    python -m arxiv_fetcher.fake_openai --port 8765 --latency 2 --max-in-flight 4
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake \\
+        arxiv-fetch analyze --input papers.json --output analyzed.json
+
+Analyses are deterministic: a paper's relevance score is derived from the
+words of its title and summary and a hash of its title. Requests beyond
+``max_in_flight`` concurrent ones are answered with HTTP 429 and a
+Retry-After header, like a rate-limited account. Packed prompts
+(``analyze --pack-size``) get an "analyses" array; ``drop_every`` leaves out
+every Nth item to exercise the single-paper fallback. ``fail_every`` answers
+every Nth completion with HTTP 500, to exercise retries of transient errors
+and of failed batch requests.
+
+Batch jobs (``analyze --batch``) are served by ``/v1/files`` and
+``/v1/batches``; a batch completes ``batch_latency`` seconds after it is
+created, and its output file holds one completion per input line, except
+for the failed ones, which go to its error file.
+"""
+
+import argparse
+import email
+import hashlib
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+# Words that raise the fake relevance score, so that relevance depends on the
+# text the way a local model (such as the prefilter) can learn
+RELEVANT_TERMS = ('application', 'applications', 'deployment', 'deployed', 'practical',
+                  'industry', 'framework', 'production', 'case', 'study', 'agents')
+
+
+def fake_analysis(title: str, summary: str = '') -> Dict[str, Any]:
+    """Return the analysis the fake server gives a paper.
+
+    The score combines how many RELEVANT_TERMS the title and summary use
+    with a hash of the title, so it is deterministic but not trivially
+    predictable from the words.
+    """
+    digest = hashlib.sha1(title.encode('utf-8')).digest()
+    words = set(re.findall(r'[a-z]+', f"{title} {summary}".lower()))
+    hits = sum(term in words for term in RELEVANT_TERMS)
+    score = round(min(1.0, 0.2 * hits + 0.4 * digest[0] / 255), 2)
+    return {
+        "is_relevant": score >= 0.5,
+        "relevance_score": score,
+        "practical_applications": f"Practical applications of {title}",
+        "thought_leadership_value": f"Thought leadership value of {title}",
+        "key_insights": [f"Insight {i + 1} of {title}" for i in range(digest[1] % 3 + 1)],
+    }
+
+
+class FakeOpenAIServer:
+    """Serves chat completions, files and batches in a background thread.
+
+    ``stats`` counts completed chat completion requests, throttled requests,
+    the highest number of requests seen in flight at once, batches, and the
+    (estimated) prompt tokens of completed requests.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 max_in_flight: Optional[int] = None, retry_after: float = 1.0,
+                 batch_latency: float = 0.0, drop_every: Optional[int] = None,
+                 fail_every: Optional[int] = None):
+        """Initialize the server.
+
+        Args:
+            host: Interface to listen on
+            port: Port to listen on; 0 picks a free one
+            latency: Seconds each completion takes
+            max_in_flight: Concurrent requests served before answering 429; unlimited by default
+            retry_after: Retry-After seconds sent with 429 responses
+            batch_latency: Seconds a batch takes to complete
+            drop_every: Leave out every Nth analysis of packed responses
+            fail_every: Answer every Nth completion request, including the
+                        requests of batches, with HTTP 500
+        """
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.retry_after = retry_after
+        self.batch_latency = batch_latency
+        self.drop_every = drop_every
+        self.fail_every = fail_every
+        self._packed_items = 0
+        self._completions = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'failed': 0, 'peak_in_flight': 0,
+                      'batches': 0, 'prompt_tokens': 0}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        """URL to use as OPENAI_BASE_URL."""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, body: Dict[str, Any],
+                           headers: Optional[Dict[str, str]] = None) -> None:
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                path = self.path.rstrip('/')
+                if path == '/v1/chat/completions':
+                    server._complete(self, json.loads(body or b'{}'))
+                elif path == '/v1/files':
+                    self._send_json(200, server._upload(self.headers['Content-Type'], body))
+                elif path == '/v1/batches':
+                    self._send_json(200, server._create_batch(json.loads(body or b'{}')))
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if parts[:2] == ['v1', 'batches'] and len(parts) == 3 and parts[2] in server.batches:
+                    self._send_json(200, server._batch(parts[2]))
+                elif (parts[:2] == ['v1', 'files'] and len(parts) == 4 and parts[3] == 'content'
+                        and parts[2] in server.files):
+                    content = server.files[parts[2]]['content']
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/octet-stream')
+                    self.send_header('Content-Length', str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                else:
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        return Handler
+
+    def _complete(self, handler: BaseHTTPRequestHandler, request: Dict[str, Any]) -> None:
+        with self._lock:
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                self.stats['throttled'] += 1
+                throttled = True
+            else:
+                throttled = False
+                self._in_flight += 1
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self._in_flight)
+        if throttled:
+            handler._send_json(429, {"error": {"message": "Rate limit reached",
+                                               "type": "requests", "code": "rate_limit_exceeded"}},
+                               {'Retry-After': str(self.retry_after)})
+            return
+        if self._fails():
+            with self._lock:
+                self._in_flight -= 1
+            handler._send_json(500, {"error": {"message": "The server had an error",
+                                               "type": "server_error"}})
+            return
+
+        try:
+            time.sleep(self.latency)
+            completion = self.completion(request)
+            with self._lock:
+                self.stats['requests'] += 1
+                self.stats['prompt_tokens'] += completion['usage']['prompt_tokens']
+            handler._send_json(200, completion)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _fails(self) -> bool:
+        """Count a completion and return whether it is one of the fail_every failures."""
+        with self._lock:
+            self._completions += 1
+            failed = bool(self.fail_every) and self._completions % self.fail_every == 0
+            self.stats['failed'] += failed
+        return failed
+
+    def _add_file(self, filename: str, content: bytes, purpose: str) -> Dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        info = {"id": file_id, "object": "file", "bytes": len(content),
+                "created_at": int(time.time()), "filename": filename, "purpose": purpose,
+                "status": "processed"}
+        with self._lock:
+            self.files[file_id] = {**info, 'content': content}
+        return info
+
+    def _upload(self, content_type: str, body: bytes) -> Dict[str, Any]:
+        """Store a file sent as multipart/form-data."""
+        message = email.message_from_bytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('utf-8') + body)
+        fields = {}
+        for part in message.get_payload():
+            name = part.get_param('name', header='content-disposition')
+            fields[name] = (part.get_filename(), part.get_payload(decode=True))
+        filename, content = fields['file']
+        return self._add_file(filename or 'upload.jsonl', content, fields['purpose'][1].decode())
+
+    def _create_batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        lines = [line for line in self.files[request['input_file_id']]['content'].splitlines()
+                 if line.strip()]
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        with self._lock:
+            self.stats['batches'] += 1
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request['endpoint'],
+                "input_file_id": request['input_file_id'],
+                "completion_window": request['completion_window'],
+                "status": "in_progress",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+                "metadata": request.get('metadata'),
+                '_ready_at': time.monotonic() + self.batch_latency,
+            }
+        return self._batch(batch_id)
+
+    def _batch(self, batch_id: str) -> Dict[str, Any]:
+        """Return a batch, completing it once its latency has passed."""
+        batch = self.batches[batch_id]
+        if batch['status'] == 'in_progress' and time.monotonic() >= batch['_ready_at']:
+            output, errors = [], []
+            for line in self.files[batch['input_file_id']]['content'].splitlines():
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                if self._fails():
+                    status_code = 500
+                    body = {"error": {"message": "The server had an error",
+                                      "type": "server_error"}}
+                else:
+                    status_code, body = 200, self.completion(request['body'])
+                (output if status_code == 200 else errors).append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                    "custom_id": request['custom_id'],
+                    "response": {"status_code": status_code, "request_id": uuid.uuid4().hex,
+                                 "body": body},
+                    "error": None,
+                }))
+            output_file = self._add_file(f"{batch_id}_output.jsonl",
+                                         '\n'.join(output).encode('utf-8') + b'\n', 'batch_output')
+            error_file_id = None
+            if errors:
+                error_file_id = self._add_file(f"{batch_id}_errors.jsonl",
+                                               '\n'.join(errors).encode('utf-8') + b'\n',
+                                               'batch_output')['id']
+            counts = batch['request_counts']
+            batch.update(status='completed', output_file_id=output_file['id'],
+                         error_file_id=error_file_id, completed_at=int(time.time()),
+                         request_counts={**counts, 'completed': len(output),
+                                         'failed': len(errors)})
+        return {key: value for key, value in batch.items() if not key.startswith('_')}
+
+    def _packed_analyses(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Return the response to a packed prompt, or None if the prompt has a single paper."""
+        titles = re.findall(r'^\[(\d+)\] Paper Title: (.*)\nSummary: (.*)$', prompt, re.MULTILINE)
+        if not titles:
+            return None
+        analyses = []
+        for index, title, summary in titles:
+            with self._lock:
+                self._packed_items += 1
+                dropped = self.drop_every and self._packed_items % self.drop_every == 0
+            if not dropped:
+                analyses.append({"index": int(index), **fake_analysis(title, summary)})
+        return {"analyses": analyses}
+
+    def completion(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the chat completion answering a request body."""
+        prompt = request['messages'][-1]['content']
+        packed = self._packed_analyses(prompt)
+        if packed is not None:
+            content = json.dumps(packed)
+        else:
+            match = re.search(r'^Paper Title: (.*)\nSummary: (.*)$', prompt, re.MULTILINE)
+            content = json.dumps(fake_analysis(*match.groups()) if match else fake_analysis(prompt))
+        return {
+            "id": f"chatcmpl-fake-{hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get('model', 'gpt-4o'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4},
+        }
+
+    def start(self) -> str:
+        """Start serving in a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        """Stop the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fake OpenAI chat completions server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds each completion takes')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='Concurrent requests served before answering 429')
+    parser.add_argument('--retry-after', type=float, default=1.0,
+                        help='Retry-After seconds sent with 429 responses')
+    parser.add_argument('--batch-latency', type=float, default=0.0,
+                        help='Seconds a batch takes to complete')
+    parser.add_argument('--drop-every', type=int, default=None,
+                        help='Leave out every Nth analysis of packed responses')
+    parser.add_argument('--fail-every', type=int, default=None,
+                        help='Answer every Nth completion request with HTTP 500')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.max_in_flight,
+                              args.retry_after, args.batch_latency, args.drop_every,
+                              args.fail_every)
+    print(f"Serving fake OpenAI API at {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Cross-process advisory locks on byte ranges of a lock file."""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+# POSIX record locks belong to the process and are all released when any
+# descriptor for the file is closed, so each lock file is opened once and
+# kept open; threads are serialized with an in-process lock per byte.
+_files: Dict[str, BinaryIO] = {}
+_thread_locks: Dict[Tuple[str, int], threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+LOCK_POLL_INTERVAL = 0.05  # seconds between lock attempts on Windows
+
+
+def _acquire_handles(path: str, offset: int) -> Tuple[BinaryIO, threading.Lock]:
+    path = os.path.abspath(path)
+    with _registry_lock:
+        lock_file = _files.get(path)
+        if lock_file is None:
+            lock_file = _files[path] = open(path, 'a+b')
+        thread_lock = _thread_locks.setdefault((path, offset), threading.Lock())
+    return lock_file, thread_lock
+
+
+@contextmanager
+def file_lock(path: str, offset: int = 0) -> Iterator[None]:
+    """Hold an exclusive lock on one byte of a lock file.
+
+    Different offsets of the same file can be locked independently, which
+    lets one lock file guard many keys. The lock excludes other processes
+    and other threads of this process. Where neither fcntl nor msvcrt is
+    available only the in-process lock is taken.
+    """
+    lock_file, thread_lock = _acquire_handles(path, offset)
+    with thread_lock:
+        if fcntl is not None:
+            fcntl.lockf(lock_file.fileno(), fcntl.LOCK_EX, 1, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(lock_file.fileno(), fcntl.LOCK_UN, 1, offset)
+        elif msvcrt is not None:
+            _windows_lock(lock_file, offset)
+            try:
+                yield
+            finally:
+                with _registry_lock:
+                    lock_file.seek(offset)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
+
+
+def _windows_lock(lock_file: BinaryIO, offset: int) -> None:
+    """Lock one byte of the file, polling until it is free."""
+    while True:
+        # The file position is shared between threads, so seek and lock together
+        with _registry_lock:
+            lock_file.seek(offset)
+            try:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                pass
+        time.sleep(LOCK_POLL_INTERVAL)
@@ -52,6 +52,43 @@ class PaperFormatter:
 
         self.console.print(table)
 
+    def display_cache_stats(self, report: Dict[str, Any]) -> None:
+        """Display per-prefix cache statistics in a formatted table."""
+        if not report['prefixes']:
+            self.console.print(Panel("No cache statistics recorded yet.",
+                                   title="Cache Statistics",
+                                   border_style="yellow"))
+            return
+
+        table = Table(title=f"Cache Statistics (since {report['since'] or 'now'})",
+                     show_lines=True, expand=True)
+        table.add_column("Prefix", style="cyan")
+        table.add_column("Hits", justify="right", style="green")
+        table.add_column("Stale", justify="right", style="green")
+        table.add_column("Misses", justify="right", style="yellow")
+        table.add_column("Expired", justify="right", style="yellow")
+        table.add_column("Hit rate", justify="right", style="magenta")
+        table.add_column("Read", justify="right")
+        table.add_column("Write", justify="right")
+        table.add_column("Hit age", justify="right")
+        table.add_column("KB served / written", justify="right")
+
+        for prefix, counters in sorted(report['prefixes'].items()):
+            table.add_row(
+                prefix,
+                str(int(counters['hits'])),
+                str(int(counters['stale_hits'])),
+                str(int(counters['misses'])),
+                str(int(counters['expired'])),
+                f"{counters['hit_rate']:.1%}",
+                f"{counters['avg_read_ms']:.2f} ms",
+                f"{counters['avg_write_ms']:.2f} ms",
+                f"{counters['avg_hit_age_seconds'] / 60:.0f} min",
+                f"{counters['bytes_read'] / 1024:,.0f} / {counters['bytes_written'] / 1024:,.0f}"
+            )
+
+        self.console.print(table)
+
     def display_categories(self, categories: Dict[str, str]) -> None:
         """Display arXiv categories in a formatted table."""
         table = Table(title="arXiv Categories", show_lines=True, expand=True)
@@ -0,0 +1,215 @@
+"""Pooled keep-alive HTTP connections shared by the arXiv clients."""
+
+import gzip
+import http.client
+import io
+import threading
+import urllib.error
+import urllib.parse
+from contextlib import contextmanager
+from email.message import Message
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .config import HTTP_POOL_SIZE, HTTP_TIMEOUT, USER_AGENT
+
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+# Errors raised when a pooled connection was closed by the server while idle
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError,
+                           ConnectionResetError, ConnectionAbortedError)
+
+PoolKey = Tuple[str, str, Optional[int]]
+
+
+class TeeReader:
+    """Readable stream that copies everything read from it into a sink."""
+
+    def __init__(self, stream, sink: io.BytesIO):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+
+class PooledResponse:
+    """Response body stream with gzip transparently decoded.
+
+    If a ``capture`` buffer is given, the raw body bytes, still compressed
+    as sent (see ``content_encoding``), are copied into it as they are read.
+    """
+
+    def __init__(self, url: str, response: http.client.HTTPResponse,
+                 capture: Optional[io.BytesIO] = None):
+        self.url = url
+        self.status = response.status
+        self.headers: Message = response.headers
+        self.content_encoding = response.getheader('Content-Encoding', '').lower()
+        self._raw = TeeReader(response, capture) if capture is not None else response
+        if self.content_encoding == 'gzip':
+            self._body = gzip.GzipFile(fileobj=self._raw)
+        else:
+            self._body = self._raw
+
+    def read(self, size: int = -1) -> bytes:
+        """Read decoded bytes from the body."""
+        return self._body.read(size)
+
+    def drain(self) -> None:
+        """Read the rest of the raw body, e.g. so a capture holds all of it."""
+        self._raw.read()
+
+
+class HTTPConnectionPool:
+    """Keeps idle keep-alive connections per host and hands them out one request at a time.
+
+    Connections are checked out exclusively for the duration of a request,
+    so a pool can be shared between threads. Counters in ``stats`` show how
+    often an idle connection was reused instead of opening a new one.
+    """
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.stats = {
+            'requests': 0,
+            'connections_opened': 0,
+            'connections_reused': 0,
+        }
+        self._idle: Dict[PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _checkout(self, key: PoolKey) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return an idle connection for the host, or a new one, and whether it was reused."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.stats['connections_reused'] += 1
+                return idle.pop(), True
+            self.stats['connections_opened'] += 1
+
+        scheme, host, port = key
+        connection_class = (http.client.HTTPSConnection if scheme == 'https'
+                            else http.client.HTTPConnection)
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def _release(self, key: PoolKey, connection: http.client.HTTPConnection) -> None:
+        """Return a connection to the pool, closing it if the pool is full."""
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.pool_size:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, url: str, headers: Dict[str, str]
+              ) -> Tuple[PoolKey, http.client.HTTPConnection, http.client.HTTPResponse]:
+        """Send a GET request, retrying once on a fresh connection if a pooled one went stale."""
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path = f'{path}?{parts.query}'
+
+        request_headers = {
+            'User-Agent': USER_AGENT,
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            **headers,
+        }
+
+        while True:
+            connection, reused = self._checkout(key)
+            try:
+                connection.request('GET', path, headers=request_headers)
+                return key, connection, connection.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+            except Exception:
+                connection.close()
+                raise
+
+    @contextmanager
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None,
+             capture: Optional[io.BytesIO] = None) -> Iterator[PooledResponse]:
+        """Perform a GET request and yield the response.
+
+        Redirects are followed and error statuses raise
+        ``urllib.error.HTTPError``; 304 responses are yielded to the caller.
+        When the block exits, any unread body is drained so the connection
+        can be reused. The raw body is copied into ``capture`` as it is read.
+        """
+        headers = headers or {}
+        for _ in range(MAX_REDIRECTS + 1):
+            self._count('requests')
+            key, connection, response = self._send(url, headers)
+
+            if response.status in REDIRECT_STATUSES and response.getheader('Location'):
+                self._finish(key, connection, response)
+                url = urllib.parse.urljoin(url, response.getheader('Location'))
+                continue
+
+            if response.status >= 400:
+                self._finish(key, connection, response)
+                raise urllib.error.HTTPError(url, response.status, response.reason,
+                                             response.headers, None)
+            break
+        else:
+            raise urllib.error.URLError(f"Too many redirects for {url}")
+
+        reusable = False
+        try:
+            yield PooledResponse(url, response, capture)
+            reusable = True
+        except GeneratorExit:
+            # The consumer stopped reading early; the connection is still healthy
+            reusable = True
+            raise
+        finally:
+            if reusable:
+                self._finish(key, connection, response)
+            else:
+                connection.close()
+
+    def _finish(self, key: PoolKey, connection: http.client.HTTPConnection,
+                response: http.client.HTTPResponse) -> None:
+        """Drain the response and hand the connection back to the pool."""
+        try:
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            return
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(key, connection)
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+
+_default_pool: Optional[HTTPConnectionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> HTTPConnectionPool:
+    """Return the process-wide connection pool shared by the arXiv clients."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = HTTPConnectionPool()
+        return _default_pool
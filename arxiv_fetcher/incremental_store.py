@@ -0,0 +1,83 @@
+"""Persisted high-water marks and results for incremental fetches."""
+
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from .arxiv_client import ArxivClient, parse_published
+from .cache_backends import write_json_atomic
+from .paper import Paper, as_dicts
+from .query_planner import combo_key
+
+
+class IncrementalStore:
+    """Remembers, per category combination, the newest paper seen and the papers kept so far.
+
+    The file maps a combo key (see ``query_planner.combo_key``) to its
+    watermark (``published`` timestamp and arXiv ID of the newest paper)
+    and the papers still inside the fetch window.
+    """
+
+    def __init__(self, state_file: str):
+        self.state_file = state_file
+        self.state: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the state file, starting fresh if it is missing or unreadable."""
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except json.JSONDecodeError:
+            return {}
+        for entry in state.values():
+            entry['papers'] = [Paper.from_dict(paper) for paper in entry.get('papers', [])]
+        return state
+
+    def save(self) -> None:
+        """Write the state file."""
+        state = {
+            key: {**entry, 'papers': as_dicts(entry['papers'])}
+            for key, entry in self.state.items()
+        }
+        write_json_atomic(self.state_file, state)
+
+    def watermark(self, combo: tuple) -> Optional[datetime]:
+        """Return the publication time of the newest paper seen for a combo."""
+        entry = self.state.get(combo_key(combo))
+        if not entry or not entry.get('watermark'):
+            return None
+        return parse_published(entry['watermark']['published'])
+
+    def merge(self, combo: tuple, new_papers: List[Paper],
+              window_start: datetime) -> List[Paper]:
+        """Merge newly fetched papers into a combo's stored results and advance its watermark.
+
+        Papers published before ``window_start`` are dropped. Returns the
+        merged papers, newest first.
+        """
+        key = combo_key(combo)
+        entry = self.state.get(key, {})
+
+        papers_by_id: Dict[str, Paper] = {}
+        for paper in entry.get('papers', []) + new_papers:
+            papers_by_id[ArxivClient.paper_id(paper)] = paper
+
+        papers = sorted(
+            (paper for paper in papers_by_id.values()
+             if paper.published_at >= window_start),
+            key=lambda paper: paper.published_at,
+            reverse=True
+        )
+
+        watermark = entry.get('watermark')
+        if papers and (watermark is None or papers[0]['published'] >= watermark['published']):
+            watermark = {
+                'published': papers[0]['published'],
+                'arxiv_id': ArxivClient.paper_id(papers[0]),
+            }
+
+        self.state[key] = {'watermark': watermark, 'papers': papers}
+        return papers
@@ -0,0 +1,181 @@
+"""Bulk metadata harvesting from the arXiv OAI-PMH interface."""
+
+import hashlib
+import io
+import os
+import time
+import urllib.error
+import urllib.parse
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import API_DELAY, OAI_MAX_RETRIES, OAI_METADATA_PREFIX, OAI_PMH_URL
+from .http_pool import HTTPConnectionPool, get_default_pool
+from .paper import Paper
+from .query_planner import matches_combo, normalize_combo
+from .rate_limiter import RateLimiter
+
+OAI_NAMESPACE = '{http://www.openarchives.org/OAI/2.0/}'
+ARXIV_NAMESPACE = '{http://arxiv.org/OAI/arXiv/}'
+
+
+class RecordedResponses:
+    """Offline stand-in for the HTTP pool that replays recorded OAI-PMH responses.
+
+    Responses are stored in ``directory`` under a hash of the request URL's
+    query string. If ``record_from`` is given, missing responses are fetched
+    through it and saved, so a live run can be recorded once and replayed.
+    """
+
+    def __init__(self, directory: str, record_from: Optional[HTTPConnectionPool] = None):
+        self.directory = directory
+        self.record_from = record_from
+
+    def _path(self, url: str) -> str:
+        query = urllib.parse.urlsplit(url).query
+        digest = hashlib.sha1(query.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.xml')
+
+    @contextmanager
+    def open(self, url: str, headers: Optional[Dict[str, str]] = None) -> Iterator[io.BufferedReader]:
+        """Yield the recorded response body for a URL."""
+        path = self._path(url)
+        if not os.path.exists(path):
+            if self.record_from is None:
+                raise urllib.error.URLError(f"No recorded response for {url}")
+            os.makedirs(self.directory, exist_ok=True)
+            with self.record_from.open(url, headers) as response:
+                with open(path, 'wb') as f:
+                    f.write(response.read())
+
+        with open(path, 'rb') as f:
+            yield f
+
+
+class OAIHarvester:
+    """Harvests arXiv metadata records with OAI-PMH ``ListRecords``.
+
+    Records are parsed incrementally and converted into the same Paper records
+    ``ArxivClient.fetch_papers`` returns, following resumption tokens until
+    the set is exhausted.
+    """
+
+    def __init__(self, base_url: str = OAI_PMH_URL, transport=None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """Initialize the harvester.
+
+        Args:
+            base_url: OAI-PMH endpoint
+            transport: Object with an ``open(url)`` context manager yielding a
+                       readable response, e.g. an HTTPConnectionPool (default)
+                       or RecordedResponses for offline runs
+            rate_limiter: Limiter spacing requests; defaults to API_DELAY seconds
+        """
+        self.base_url = base_url
+        self.transport = transport or get_default_pool()
+        self.rate_limiter = rate_limiter or RateLimiter(API_DELAY)
+        self.stats = {'requests': 0, 'records': 0, 'deleted': 0}
+
+    def _text(self, element: ET.Element, tag: str) -> str:
+        """Return the whitespace-normalized text of a child element."""
+        found = element.find(f'{ARXIV_NAMESPACE}{tag}')
+        if found is None or found.text is None:
+            return ""
+        return ' '.join(found.text.split())
+
+    def _parse_record(self, metadata: ET.Element) -> Paper:
+        """Convert an arXiv metadata element into a Paper."""
+        authors = []
+        for author in metadata.iter(f'{ARXIV_NAMESPACE}author'):
+            name = ' '.join(part for part in (self._text(author, 'forenames'),
+                                              self._text(author, 'keyname')) if part)
+            authors.append(name)
+
+        arxiv_id = self._text(metadata, 'id')
+        return Paper(
+            title=self._text(metadata, 'title'),
+            authors=authors,
+            published=f"{self._text(metadata, 'created')}T00:00:00Z",
+            summary=self._text(metadata, 'abstract'),
+            link=f'http://arxiv.org/abs/{arxiv_id}',
+            categories=self._text(metadata, 'categories').split()
+        )
+
+    def _iter_response(self, url: str, state: Dict[str, Any]) -> Iterator[Paper]:
+        """Yield the papers of one ListRecords response, retrying 503 Retry-After replies.
+
+        The response's resumption token is stored in ``state['token']``.
+        """
+        for attempt in range(OAI_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            self.stats['requests'] += 1
+            try:
+                with self.transport.open(url) as response:
+                    yield from self._parse_response(response, state)
+                return
+            except urllib.error.HTTPError as e:
+                if e.code != 503 or attempt == OAI_MAX_RETRIES:
+                    raise
+                retry_after = e.headers.get('Retry-After', '') if e.headers else ''
+                time.sleep(int(retry_after) if retry_after.isdigit() else API_DELAY)
+
+    def _parse_response(self, response, state: Dict[str, Any]) -> Iterator[Paper]:
+        """Parse a ListRecords response incrementally."""
+        state['token'] = None
+        root = None
+        for event, element in ET.iterparse(response, events=('start', 'end')):
+            if root is None:
+                root = element
+            if event != 'end':
+                continue
+            if element.tag == f'{OAI_NAMESPACE}record':
+                header = element.find(f'{OAI_NAMESPACE}header')
+                metadata = element.find(f'{OAI_NAMESPACE}metadata/{ARXIV_NAMESPACE}arXiv')
+                if (header is not None and header.get('status') == 'deleted') or metadata is None:
+                    self.stats['deleted'] += 1
+                else:
+                    self.stats['records'] += 1
+                    yield self._parse_record(metadata)
+                element.clear()
+            elif element.tag == f'{OAI_NAMESPACE}resumptionToken':
+                state['token'] = (element.text or '').strip() or None
+            elif element.tag == f'{OAI_NAMESPACE}error':
+                if element.get('code') == 'noRecordsMatch':
+                    return
+                raise Exception(f"OAI-PMH error {element.get('code')}: {element.text}")
+
+    def iter_records(self, set_spec: str, from_date: Optional[date] = None,
+                     until_date: Optional[date] = None,
+                     categories: Optional[List[tuple]] = None) -> Iterator[Paper]:
+        """Yield papers from a set, following resumption tokens.
+
+        Args:
+            set_spec: OAI-PMH set, e.g. 'cs'
+            from_date: Earliest record datestamp (last metadata change, not submission)
+            until_date: Latest record datestamp
+            categories: Optional (cat1, cat2, operator) combos; only papers
+                       matching at least one are yielded
+        """
+        combos = [normalize_combo(combo) for combo in categories or []]
+        params = {'verb': 'ListRecords', 'metadataPrefix': OAI_METADATA_PREFIX, 'set': set_spec}
+        if from_date:
+            params['from'] = from_date.isoformat()
+        if until_date:
+            params['until'] = until_date.isoformat()
+
+        state: Dict[str, Any] = {}
+        url = f"{self.base_url}?{urllib.parse.urlencode(params)}"
+        while True:
+            try:
+                for paper in self._iter_response(url, state):
+                    if not combos or any(matches_combo(paper, combo) for combo in combos):
+                        yield paper
+            except (OSError, ET.ParseError) as e:
+                raise Exception(f"Error harvesting records from arXiv: {str(e)}")
+
+            if not state.get('token'):
+                return
+            token_params = {'verb': 'ListRecords', 'resumptionToken': state['token']}
+            url = f"{self.base_url}?{urllib.parse.urlencode(token_params)}"
@@ -0,0 +1,168 @@
+"""Run chat completion requests through the OpenAI Batch API."""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache_backends import write_json_atomic
+from .config import (ANALYSIS_BATCH_MAX_REQUESTS, ANALYSIS_BATCH_POLL_INTERVAL,
+                     ANALYSIS_BATCH_RESUME_WINDOW)
+from .openai_client import get_openai_client
+
+# Batch statuses after which a batch no longer changes
+TERMINAL_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+
+def write_batch_file(requests: Dict[str, Dict[str, Any]], path: str) -> None:
+    """Write chat completion request bodies as a Batch API input file, one JSON line per request."""
+    with open(path, 'w', encoding='utf-8') as f:
+        for custom_id, body in requests.items():
+            f.write(json.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }) + '\n')
+
+
+def wait_for_batch(batch_id: str, poll_interval: float = ANALYSIS_BATCH_POLL_INTERVAL) -> Any:
+    """Poll a batch until it completes, fails, expires or is cancelled, and return it."""
+    client = get_openai_client()
+    progress = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        counts = batch.request_counts
+        if counts is not None and (batch.status, counts.completed) != progress:
+            progress = (batch.status, counts.completed)
+            print(f"Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} requests done")
+        time.sleep(poll_interval)
+
+
+def _read_results(file_id: str, completions: Dict[str, Dict[str, Any]],
+                  errors: Dict[str, str]) -> None:
+    """Sort the lines of a batch output or error file into completions and errors."""
+    content = get_openai_client().files.content(file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get('response') or {}
+        if response.get('status_code') == 200:
+            completions[record['custom_id']] = response['body']
+        else:
+            error = record.get('error') or (response.get('body') or {}).get('error') or {}
+            errors[record['custom_id']] = (error.get('message')
+                                           or f"HTTP {response.get('status_code')}")
+
+
+def requests_key(requests: Dict[str, Dict[str, Any]]) -> str:
+    """Return a hash identifying a set of requests, so a rerun can find the batch that holds them."""
+    return hashlib.sha256(json.dumps(requests, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_pending(state_file: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """Read the batches submitted earlier whose results were not collected, by requests_key.
+
+    Entries older than ANALYSIS_BATCH_RESUME_WINDOW are dropped, as their
+    output may no longer be available.
+    """
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            pending = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    oldest = time.time() - ANALYSIS_BATCH_RESUME_WINDOW
+    return {key: entry for key, entry in pending.items() if entry.get('submitted_at', 0) >= oldest}
+
+
+def _save_pending(state_file: Optional[str], pending: Dict[str, Dict[str, Any]]) -> None:
+    if state_file:
+        write_json_atomic(state_file, pending)
+
+
+def _submit(chunk: Dict[str, Dict[str, Any]], path: str) -> str:
+    """Upload a chunk of requests as a batch input file, create the batch and return its ID."""
+    client = get_openai_client()
+    write_batch_file(chunk, path)
+    with open(path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose='batch')
+    batch = client.batches.create(input_file_id=input_file.id,
+                                  endpoint='/v1/chat/completions',
+                                  completion_window='24h')
+    print(f"Submitted batch {batch.id} with {len(chunk)} requests")
+    return batch.id
+
+
+def _resumable(batch_id: str) -> bool:
+    """Check that a batch saved by an earlier run still exists."""
+    try:
+        get_openai_client().batches.retrieve(batch_id)
+    except Exception as e:
+        print(f"Cannot resume batch {batch_id}, submitting its requests again: {str(e)}")
+        return False
+    return True
+
+
+def run_batch(requests: Dict[str, Dict[str, Any]],
+              poll_interval: float = ANALYSIS_BATCH_POLL_INTERVAL,
+              max_requests: int = ANALYSIS_BATCH_MAX_REQUESTS,
+              state_file: Optional[str] = None
+              ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """Submit chat completion requests as batch jobs and wait for their results.
+
+    Requests are split into batches of at most max_requests (the Batch API's
+    per-file limit), which are all submitted before polling any of them.
+    With a state_file, the ID of each submitted batch is saved until its
+    results are read, and a run with the same requests resumes it instead
+    of submitting (and paying for) them again.
+
+    Args:
+        requests: Chat completion request bodies by custom ID
+        poll_interval: Seconds between status checks
+        max_requests: Maximum number of requests per batch
+        state_file: Optional JSON file of batches awaiting their results
+
+    Returns:
+        The completion bodies of successful requests and the error messages
+        of failed ones, both by custom ID; every request is in one of them
+    """
+    items = list(requests.items())
+    chunks: List[Dict[str, Dict[str, Any]]] = [
+        dict(items[start:start + max_requests]) for start in range(0, len(items), max_requests)]
+
+    pending = load_pending(state_file)
+    keys = [requests_key(chunk) for chunk in chunks]
+    batch_ids = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for number, (key, chunk) in enumerate(zip(keys, chunks)):
+            saved = pending.get(key)
+            if saved is not None and _resumable(saved['batch_id']):
+                print(f"Resuming batch {saved['batch_id']} with {len(chunk)} requests")
+                batch_ids.append(saved['batch_id'])
+                continue
+            batch_id = _submit(chunk, os.path.join(tmp_dir, f'batch-{number}.jsonl'))
+            pending[key] = {'batch_id': batch_id, 'submitted_at': time.time()}
+            _save_pending(state_file, pending)
+            batch_ids.append(batch_id)
+
+    completions: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    for key, batch_id, chunk in zip(keys, batch_ids, chunks):
+        batch = wait_for_batch(batch_id, poll_interval)
+        # Expired and cancelled batches still return the requests they finished
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                _read_results(file_id, completions, errors)
+        for custom_id in chunk:
+            if custom_id not in completions and custom_id not in errors:
+                errors[custom_id] = f"Batch {batch_id} {batch.status} without a result"
+        pending.pop(key, None)
+        _save_pending(state_file, pending)
+    return completions, errors
@@ -0,0 +1,25 @@
+"""Shared OpenAI client, created on first use."""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_client: Optional['OpenAI'] = None
+_client_lock = threading.Lock()
+
+
+def get_openai_client() -> 'OpenAI':
+    """Return the process-wide OpenAI client used by the analyzer and summarizer.
+
+    The openai package is only imported, and the client only created, the
+    first time a command actually calls the API.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import OpenAI
+            _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+        return _client
@@ -0,0 +1,87 @@
+"""Compact record type for arXiv papers."""
+
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, Union
+
+PUBLISHED_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+class Paper:
+    """A paper's metadata, stored in slots instead of a per-paper dict.
+
+    The publication time is kept only as a datetime (``published_at``) and
+    category strings are interned, so thousands of papers share one copy of
+    each category name. Papers also behave like the read-only dicts used
+    throughout the pipeline: ``paper['title']``, ``paper.get(...)``,
+    ``'link' in paper`` and ``{**paper}`` all work, and ``to_dict`` returns
+    the JSON-ready form.
+    """
+
+    __slots__ = ('title', 'authors', 'published_at', 'summary', 'link', 'categories')
+
+    FIELDS = ('title', 'authors', 'published', 'summary', 'link', 'categories')
+
+    def __init__(self, title: str, authors: Iterable[str], published: Union[str, datetime],
+                 summary: str, link: str, categories: Iterable[str]):
+        self.title = title
+        self.authors: Tuple[str, ...] = tuple(authors)
+        if isinstance(published, str):
+            published = datetime.strptime(published[:19], '%Y-%m-%dT%H:%M:%S')
+        self.published_at: datetime = published
+        self.summary = summary
+        self.link = link
+        # Kept as a list so categories from duplicate copies can be merged in
+        self.categories: List[str] = [sys.intern(category) for category in categories]
+
+    @property
+    def published(self) -> str:
+        """Publication time in the Atom format, e.g. '2024-01-08T17:59:59Z'."""
+        return self.published_at.strftime(PUBLISHED_FORMAT)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Paper':
+        """Build a paper from its dict form; extra keys are ignored."""
+        return cls(data['title'], data['authors'], data['published'],
+                   data['summary'], data['link'], data['categories'])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the paper as a plain, JSON-serializable dict."""
+        return {
+            'title': self.title,
+            'authors': list(self.authors),
+            'published': self.published,
+            'summary': self.summary,
+            'link': self.link,
+            'categories': list(self.categories)
+        }
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.FIELDS
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self.FIELDS else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.FIELDS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f'Paper(link={self.link!r}, title={self.title!r})'
+
+
+def as_dict(paper: Union[Paper, Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the dict form of a Paper, passing dicts through unchanged."""
+    return paper.to_dict() if isinstance(paper, Paper) else paper
+
+
+def as_dicts(papers: Iterable[Union[Paper, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Return the dict form of every paper."""
+    return [as_dict(paper) for paper in papers]
@@ -1,24 +1,93 @@
 """Paper analyzer module that uses GPT-4o to identify relevant papers."""
 
+import hashlib
 import json
-import os
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+from .cache_manager import CacheManager
+from .config import (ANALYSIS_BACKOFF, ANALYSIS_BATCH_STATE_FILE, ANALYSIS_CONCURRENCY,
+                     ANALYSIS_MAX_RETRIES, ANALYSIS_PACK_SIZE)
+from .openai_batch import run_batch
+from .openai_client import get_openai_client
+from .rate_limiter import AdaptiveConcurrencyLimiter
+
+# Loaded by the caller only when a prefilter is used
+if TYPE_CHECKING:
+    from .prefilter import RelevancePrefilter
 
 # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
 # do not change this unless explicitly requested by the user
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai = OpenAI(api_key=OPENAI_API_KEY)
+MODEL = "gpt-4o"
 
-def analyze_paper(paper: Dict) -> Dict:
-    """Analyze a single paper using GPT-4o."""
-    prompt = f"""Analyze this research paper summary and determine its relevance for practical AI applications and thought leadership.
-Focus on papers that:
+# Part of the analysis cache key; bump it whenever the prompt below or the cached entries change
+PROMPT_VERSION = 2
+
+# Shared by the single-paper and packed prompts
+ANALYSIS_CRITERIA = """Focus on papers that:
 1. Discuss practical applications of AI
 2. Present insights valuable for thought leadership
-3. Offer implementable methodologies or frameworks
+3. Offer implementable methodologies or frameworks"""
+
+# Types of the fields every analysis must have
+ANALYSIS_FIELDS = {
+    "is_relevant": bool,
+    "relevance_score": (int, float),
+    "practical_applications": str,
+    "thought_leadership_value": str,
+    "key_insights": list,
+}
+
+def analysis_cache_key(paper: Dict, pack_size: int = 1) -> str:
+    """Return the cache key of a paper's analysis.
+
+    The key hashes the paper's title and summary with the prompt version and
+    model, so a paper is analyzed again only if one of them changes.
+    Analyses made by packed prompts have their own keys, which include the
+    pack size, since the prompt differs.
+    """
+    fields = [paper['title'], paper['summary'], PROMPT_VERSION, MODEL]
+    if pack_size > 1:
+        fields += ['packed', pack_size]
+    content = json.dumps(fields)
+    return f"analysis_{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+
+def _is_transient(error: Exception) -> bool:
+    """Check whether a failed request may succeed if sent again.
+
+    These are the errors the OpenAI SDK retries by default: rate limits
+    (429), request timeouts (408), lock conflicts (409), server errors
+    (5xx), and timeouts and connection errors without a response.
+    """
+    status_code = getattr(error, 'status_code', None)
+    if status_code is not None:
+        return status_code in (408, 409, 429) or status_code >= 500
+    from openai import APIConnectionError  # the error came from the SDK, so it is loaded
+    return isinstance(error, APIConnectionError)
+
+def _retry_after(error: Exception, attempt: int) -> Optional[float]:
+    """Return how long to wait before retrying a request, or None if it should not be retried.
+
+    Transient errors (see _is_transient) are retried up to
+    ANALYSIS_MAX_RETRIES times; the server's Retry-After header is
+    honoured, with exponential backoff otherwise.
+    """
+    if attempt >= ANALYSIS_MAX_RETRIES or not _is_transient(error):
+        return None
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers['retry-after'])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return ANALYSIS_BACKOFF * 2 ** attempt * random.uniform(0.5, 1)
+
+def analysis_request(paper: Dict) -> Dict:
+    """Return the chat completion request body that analyzes a paper."""
+    prompt = f"""Analyze this research paper summary and determine its relevance for practical AI applications and thought leadership.
+{ANALYSIS_CRITERIA}
 
 Paper Title: {paper['title']}
 Summary: {paper['summary']}
@@ -32,19 +101,205 @@ Respond with JSON in this format:
     "key_insights": list of strings
 }}
 """
-    
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"}
+    }
+
+def _create_completion(request: Dict, limiter: AdaptiveConcurrencyLimiter) -> str:
+    """Send a chat completion request and return the response content.
+
+    Transient errors are retried: rate-limited requests through the limiter,
+    which lowers the concurrency, others after a backoff. Other errors are
+    raised.
+    """
+    # Retries are done here rather than by the SDK, so the limiter sees every 429
+    client = get_openai_client().with_options(max_retries=0)
+    attempt = 0
+    while True:
+        try:
+            with limiter.slot():
+                response = client.chat.completions.create(**request)
+            limiter.record_success()
+            return response.choices[0].message.content
+        except Exception as e:
+            retry_after = _retry_after(e, attempt)
+            if retry_after is None:
+                raise
+            if getattr(e, 'status_code', None) == 429:
+                limiter.record_throttled(retry_after)
+            else:
+                time.sleep(retry_after)
+            attempt += 1
+
+def analyze_paper(paper: Dict, limiter: Optional[AdaptiveConcurrencyLimiter] = None) -> Dict:
+    """Analyze a single paper using GPT-4o.
+
+    Args:
+        paper: Paper dictionary with 'title' and 'summary'
+        limiter: Limiter shared by concurrent analyses, which backs off when
+                 requests are rate limited; a private one is used by default
+    """
     try:
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        analysis = json.loads(response.choices[0].message.content)
+        content = _create_completion(analysis_request(paper),
+                                     limiter or AdaptiveConcurrencyLimiter(1))
+        analysis = json.loads(content)
         return {**paper, "analysis": analysis}
     except Exception as e:
         print(f"Error analyzing paper '{paper['title']}': {str(e)}")
         return None
 
+def packed_analysis_request(papers: List[Dict]) -> Dict:
+    """Return a chat completion request body that analyzes several papers at once.
+
+    The papers are numbered from 0, and the response is a JSON object whose
+    "analyses" array holds one analysis per paper, tagged with its "index".
+    """
+    listing = "\n\n".join(f"[{index}] Paper Title: {paper['title']}\nSummary: {paper['summary']}"
+                           for index, paper in enumerate(papers))
+    prompt = f"""Analyze each of these {len(papers)} research paper summaries and determine its relevance for practical AI applications and thought leadership.
+{ANALYSIS_CRITERIA}
+
+{listing}
+
+Respond with JSON in this format, with one analysis per paper, in any order, where "index" is the paper's number in brackets:
+{{
+    "analyses": [
+        {{
+            "index": integer,
+            "is_relevant": boolean,
+            "relevance_score": float (0-1),
+            "practical_applications": string,
+            "thought_leadership_value": string,
+            "key_insights": list of strings
+        }}
+    ]
+}}
+"""
+    return {
+        "model": MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"}
+    }
+
+def _is_valid_analysis(analysis: Dict) -> bool:
+    """Check that an analysis has every field, with the expected types and ranges."""
+    for field, expected in ANALYSIS_FIELDS.items():
+        value = analysis.get(field)
+        # bool is an int subclass, so a score of true/false must be rejected explicitly
+        if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+            return False
+    return (0 <= analysis["relevance_score"] <= 1
+            and all(isinstance(insight, str) for insight in analysis["key_insights"]))
+
+def split_packed_analyses(content: str, count: int) -> List[Optional[Dict]]:
+    """Split the response to a packed request into the analyses of its papers.
+
+    Returns one analysis per paper, in prompt order. Papers whose analysis
+    is missing, duplicated or malformed get None. Raises ValueError if the
+    response is not a JSON object with an "analyses" array.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Response is not valid JSON: {str(e)}")
+    items = data.get("analyses") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise ValueError('Response has no "analyses" array')
+
+    analyses: List[Optional[Dict]] = [None] * count
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        index = item.get("index")
+        if isinstance(index, bool) or not isinstance(index, int) or not 0 <= index < count:
+            continue
+        analysis = {key: value for key, value in item.items() if key != "index"}
+        if index in seen:
+            # Two answers for one paper: trust neither
+            analyses[index] = None
+        elif _is_valid_analysis(analysis):
+            analyses[index] = analysis
+        seen.add(index)
+    return analyses
+
+def analyze_packed(papers: List[Dict],
+                   limiter: Optional[AdaptiveConcurrencyLimiter] = None
+                   ) -> Tuple[List[Optional[Dict]], List[bool]]:
+    """Analyze several papers with one packed request.
+
+    Papers the response has no valid analysis for are analyzed again with
+    single-paper requests, as are all of them if the request fails.
+
+    Returns:
+        The analyzed papers in input order (None for failures) and, for
+        each of them, whether its analysis came from the packed request
+        rather than a single-paper fallback
+    """
+    limiter = limiter or AdaptiveConcurrencyLimiter(1)
+    try:
+        analyses = split_packed_analyses(
+            _create_completion(packed_analysis_request(papers), limiter), len(papers))
+    except Exception as e:
+        print(f"Error analyzing {len(papers)} papers in one request, "
+              f"analyzing them one at a time: {str(e)}")
+        analyses = [None] * len(papers)
+
+    results = [{**paper, "analysis": analysis} if analysis is not None
+               else analyze_paper(paper, limiter)
+               for paper, analysis in zip(papers, analyses)]
+    return results, [analysis is not None for analysis in analyses]
+
+def analyze_batch(papers: List[Dict], pack_size: int = 1,
+                  state_file: Optional[str] = ANALYSIS_BATCH_STATE_FILE
+                  ) -> Tuple[List[Optional[Dict]], List[bool]]:
+    """Analyze papers with one OpenAI Batch API job and wait for the results.
+
+    Results are joined back to the papers by the requests' custom IDs, which
+    encode the papers' positions. With a pack_size above 1, each request
+    analyzes that many papers. Papers whose request failed, or that have no
+    valid analysis in a packed response, are reported and returned as None,
+    for the caller to analyze again. The batch IDs are saved in state_file
+    until the results are read, so an interrupted run resumes them.
+
+    Returns:
+        The analyzed papers in input order and, for each of them, whether
+        it was analyzed by a packed request
+    """
+    groups = [list(range(start, min(start + pack_size, len(papers))))
+              for start in range(0, len(papers), max(1, pack_size))]
+    requests = {}
+    for group in groups:
+        if len(group) == 1:
+            requests[f"paper-{group[0]}"] = analysis_request(papers[group[0]])
+        else:
+            requests[f"papers-{group[0]}-{group[-1]}"] = packed_analysis_request(
+                [papers[index] for index in group])
+    completions, errors = run_batch(requests, state_file=state_file)
+
+    results: List[Optional[Dict]] = [None] * len(papers)
+    packed = [False] * len(papers)
+    for custom_id, group in zip(requests, groups):
+        try:
+            if custom_id not in completions:
+                raise Exception(errors[custom_id])
+            content = completions[custom_id]['choices'][0]['message']['content']
+            if len(group) == 1:
+                analyses = [json.loads(content)]
+            else:
+                analyses = split_packed_analyses(content, len(group))
+        except Exception as e:
+            print(f"Error analyzing {len(group)} papers in batch request {custom_id}: {str(e)}")
+            continue
+
+        for index, analysis in zip(group, analyses):
+            if analysis is not None:
+                results[index] = {**papers[index], "analysis": analysis}
+                packed[index] = len(group) > 1
+    return results, packed
+
 def filter_papers(papers: List[Dict], min_relevance_score: float = 0.7) -> List[Dict]:
     """Filter papers based on relevance score."""
     return [
@@ -53,17 +308,106 @@ def filter_papers(papers: List[Dict], min_relevance_score: float = 0.7) -> List[
         and paper.get('analysis', {}).get('relevance_score', 0) >= min_relevance_score
     ]
 
-def analyze_papers(input_file: str, output_file: str, min_relevance_score: float = 0.7) -> None:
-    """Analyze papers from input JSON file and save relevant ones to output file."""
+def analyze_papers(input_file: str, output_file: str, min_relevance_score: float = 0.7,
+                   concurrency: int = ANALYSIS_CONCURRENCY,
+                   cache_manager: Optional[CacheManager] = None, batch: bool = False,
+                   pack_size: int = ANALYSIS_PACK_SIZE,
+                   prefilter: Optional['RelevancePrefilter'] = None) -> None:
+    """Analyze papers from input JSON file and save relevant ones to output file.
+
+    Args:
+        input_file: JSON file written by the fetcher
+        output_file: JSON file the relevant papers are written to
+        min_relevance_score: Minimum relevance score of the papers kept
+        concurrency: Maximum number of papers analyzed in parallel; lowered
+                     automatically while the API answers with HTTP 429
+        cache_manager: Cache of previous analyses, keyed by analysis_cache_key;
+                     only papers without a cached analysis are sent to the API.
+                     Runs with packing also reuse single-paper analyses, but
+                     not the other way around
+        batch: Analyze the papers with an OpenAI Batch API job instead of
+               individual requests; papers the job has no analysis for are
+               then analyzed with individual requests
+        pack_size: Number of papers analyzed per request; papers without a
+                   valid analysis in a packed response fall back to
+                   single-paper requests
+        prefilter: Local model that skips papers it predicts to be irrelevant
+                   before any API call; not used if it was trained for a
+                   higher min_relevance_score
+    """
     try:
         with open(input_file, 'r') as f:
             data = json.load(f)
         
-        analyzed_papers = []
-        for paper in data['papers']:
-            analyzed_paper = analyze_paper(paper)
-            if analyzed_paper:
-                analyzed_papers.append(analyzed_paper)
+        papers = data['papers']
+        pack_size = max(1, pack_size)
+        results: List[Optional[Dict]] = [None] * len(papers)
+        uncached = []
+        for index, paper in enumerate(papers):
+            cached = None
+            if cache_manager:
+                if pack_size > 1:
+                    cached = cache_manager.get(analysis_cache_key(paper, pack_size))
+                if cached is None:
+                    cached = cache_manager.get(analysis_cache_key(paper))
+            if cached is not None:
+                results[index] = {**paper, "analysis": cached["analysis"]}
+            else:
+                uncached.append(index)
+        cache_hits = len(papers) - len(uncached)
+
+        prefiltered = 0
+        if prefilter is not None and uncached:
+            if min_relevance_score < prefilter.min_relevance:
+                print(f"Warning: the prefilter was trained for a minimum relevance of "
+                      f"{prefilter.min_relevance}, so it is not used for {min_relevance_score}")
+            else:
+                kept = [index for index in uncached if prefilter.keep(papers[index])]
+                prefiltered = len(uncached) - len(kept)
+                calls_avoided = math.ceil(len(uncached) / pack_size) - math.ceil(len(kept) / pack_size)
+                uncached = kept
+
+        def store(index: int, analyzed: Optional[Dict], packed: bool = False) -> None:
+            if analyzed and cache_manager:
+                # The paper text is kept with the analysis to train the prefilter on
+                key = analysis_cache_key(papers[index], pack_size if packed else 1)
+                cache_manager.set(key, {
+                    "title": papers[index]['title'],
+                    "summary": papers[index]['summary'],
+                    "analysis": analyzed['analysis'],
+                })
+            results[index] = analyzed
+
+        limiter = AdaptiveConcurrencyLimiter(concurrency)
+        queued = uncached
+        batch_failures = 0
+        if batch and uncached:
+            batch_results, batch_packed = analyze_batch([papers[index] for index in uncached],
+                                                        pack_size)
+            queued = []
+            for index, analyzed, packed in zip(uncached, batch_results, batch_packed):
+                if analyzed is None:
+                    queued.append(index)
+                else:
+                    store(index, analyzed, packed)
+            batch_failures = len(queued)
+        groups = [queued[start:start + pack_size] for start in range(0, len(queued), pack_size)]
+
+        def analyze_group(group: List[int]) -> int:
+            if len(group) == 1:
+                store(group[0], analyze_paper(papers[group[0]], limiter))
+                return 0
+            analyzed, packed = analyze_packed([papers[index] for index in group], limiter)
+            for index, paper, from_pack in zip(group, analyzed, packed):
+                store(index, paper, from_pack)
+            return packed.count(False)
+
+        # Papers a batch has no analysis for go through the same limiter and pool
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            # sum() waits for all analyses and re-raises any worker exception
+            fallbacks = sum(executor.map(analyze_group, groups))
+        # Results are stored by input position, so the output keeps the papers' order
+        analyzed_papers = [paper for paper in results if paper]
         
         filtered_papers = filter_papers(analyzed_papers, min_relevance_score)
         
@@ -80,7 +424,22 @@ def analyze_papers(input_file: str, output_file: str, min_relevance_score: float
         with open(output_file, 'w') as f:
             json.dump(output_data, f, indent=2)
             
-        print(f"Analysis complete. Found {len(filtered_papers)} relevant papers out of {len(data['papers'])} total papers.")
+        summary = f"Analysis complete. Found {len(filtered_papers)} relevant papers out of {len(papers)} total papers"
+        if cache_manager:
+            hit_rate = cache_hits / len(papers) if papers else 0.0
+            summary += f" ({cache_hits} served from the analysis cache, {hit_rate:.1%} hit rate)"
+        print(f"{summary}.")
+        if prefiltered:
+            print(f"Prefilter skipped {prefiltered} papers predicted irrelevant, "
+                  f"avoiding {calls_avoided} API calls.")
+        if batch_failures:
+            print(f"{batch_failures} papers without a batch result were analyzed "
+                  f"with individual requests.")
+        if pack_size > 1 and queued:
+            print(f"Packed {len(queued)} papers into {len(groups)} requests; "
+                  f"{fallbacks} papers fell back to single-paper requests.")
+        if limiter.throttled:
+            print(f"Rate limited {limiter.throttled} times; finished with {limiter.limit} requests in parallel.")
         
     except Exception as e:
         print(f"Error processing papers: {str(e)}")
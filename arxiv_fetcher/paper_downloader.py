@@ -4,17 +4,22 @@ import json
 import os
 from datetime import datetime
 from typing import Dict, List, Optional
-import arxiv
 from pathlib import Path
 import re
 
+from .config import ARXIV_PDF_URL
+from .http_pool import HTTPConnectionPool, get_default_pool
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 class PaperDownloader:
     """Downloads and organizes arXiv papers as PDFs."""
 
-    def __init__(self, output_dir: str = "papers"):
-        """Initialize with output directory."""
+    def __init__(self, output_dir: str = "papers", http_pool: Optional[HTTPConnectionPool] = None):
+        """Initialize with output directory and the HTTP connection pool to download through."""
         self.output_dir = Path(output_dir)
         self.download_log = self.output_dir / ".download_log.json"
+        self.http_pool = http_pool or get_default_pool()
 
     def _load_download_log(self) -> Dict:
         """Load the download log to avoid re-downloading papers."""
@@ -37,6 +42,16 @@ class PaperDownloader:
         paper_dir.mkdir(parents=True, exist_ok=True)
         return paper_dir
 
+    def _download_pdf(self, arxiv_id: str, paper_dir: Path) -> None:
+        """Download the PDF of a paper into its directory over a pooled connection."""
+        pdf_path = paper_dir / "paper.pdf"
+        partial_path = paper_dir / "paper.pdf.part"
+        with self.http_pool.open(f"{ARXIV_PDF_URL}/{arxiv_id}") as response:
+            with open(partial_path, 'wb') as f:
+                while chunk := response.read(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(partial_path, pdf_path)
+
     def _extract_arxiv_id_from_link(self, link: str) -> Optional[str]:
         """Extract arXiv ID from a paper link/ID string."""
         # Try to match patterns like arxiv.org/abs/2401.12345 or just 2401.12345
@@ -129,11 +144,8 @@ class PaperDownloader:
                     with open(paper_dir / "metadata.json", 'w') as f:
                         json.dump(paper, f, indent=2)
 
-                    # Download PDF using arxiv package
-                    search = arxiv.Search(id_list=[arxiv_id])
-                    paper_result = next(search.results())
-                    paper_result.download_pdf(dirpath=str(paper_dir),
-                                           filename="paper.pdf")
+                    # Download PDF
+                    self._download_pdf(arxiv_id, paper_dir)
 
                     # Update download log
                     download_log['papers'][arxiv_id] = {
@@ -150,6 +162,8 @@ class PaperDownloader:
             self._save_download_log(download_log)
 
             print(f"\nDownload complete! Papers saved in: {self.output_dir}")
+            print(f"HTTP connections: {self.http_pool.stats['connections_opened']} opened, "
+                  f"{self.http_pool.stats['connections_reused']} reused")
 
         except Exception as e:
             print(f"Error processing papers: {str(e)}")
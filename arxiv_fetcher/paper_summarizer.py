@@ -1,16 +1,12 @@
 
 """Paper summarizer module that uses OpenAI to generate summaries of parsed papers."""
 
-import os
 import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
-from openai import OpenAI
-
-# Initialize OpenAI client
-openai = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+from .openai_client import get_openai_client
 
 class PaperSummarizer:
     """Paper summarizer for generating summaries using OpenAI."""
@@ -62,7 +58,7 @@ class PaperSummarizer:
         {content[:15000]}  # Limit content length for API
         """
         
-        response = openai.chat.completions.create(
+        response = get_openai_client().chat.completions.create(
             model="gpt-4o",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=600,
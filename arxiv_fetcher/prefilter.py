@@ -0,0 +1,255 @@
+"""Local relevance pre-filter that skips clearly irrelevant papers before LLM analysis."""
+
+import hashlib
+import json
+import math
+import random
+import re
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache_backends import write_json_atomic
+from .cache_manager import CacheManager
+from .config import (PREFILTER_EPOCHS, PREFILTER_FEATURES, PREFILTER_FOLDS,
+                     PREFILTER_MIN_EXAMPLES, PREFILTER_TARGET_RECALL)
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+Features = Dict[int, float]
+
+# Sparse feature weights and bias of one logistic regression
+Model = Tuple[Dict[int, float], float]
+
+
+def term_counts(paper: Dict, n_features: int = PREFILTER_FEATURES) -> Features:
+    """Return the log-scaled counts of the hashed words of a paper's title and summary.
+
+    Title words also get features of their own, so a model can weigh them
+    more than words of the summary.
+    """
+    counts: Dict[int, float] = {}
+    for field, prefix in (('title', 't:'), ('summary', '')):
+        for token in TOKEN.findall(paper.get(field, '').lower()):
+            for term in ((token, prefix + token) if prefix else (token,)):
+                bucket = zlib.crc32(term.encode('utf-8')) % n_features
+                counts[bucket] = counts.get(bucket, 0) + 1
+    return {bucket: 1 + math.log(count) for bucket, count in counts.items()}
+
+
+def tfidf(counts: Features, idf: Dict[int, float], default_idf: float) -> Features:
+    """Weight term counts by inverse document frequency and L2-normalize them.
+
+    Words that occur in nearly every abstract get little weight, so the
+    model is not swamped by them; words never seen in training get
+    default_idf, the weight of the rarest ones.
+    """
+    vector = {bucket: value * idf.get(bucket, default_idf) for bucket, value in counts.items()}
+    norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+    return {bucket: value / norm for bucket, value in vector.items()}
+
+
+def is_relevant(analysis: Dict, min_relevance: float) -> bool:
+    """Return whether an analysis passes the analyzer's relevance filter."""
+    return bool(analysis.get('is_relevant', False)) and \
+        analysis.get('relevance_score', 0) >= min_relevance
+
+
+def _sigmoid(value: float) -> float:
+    if value < -35:
+        return 0.0
+    return 1 / (1 + math.exp(-value))
+
+
+def _predict(weights: Dict[int, float], bias: float, vector: Features) -> float:
+    return _sigmoid(bias + sum(weights.get(bucket, 0.0) * value
+                               for bucket, value in vector.items()))
+
+
+def _fit(vectors: List[Features], labels: List[bool], epochs: int = PREFILTER_EPOCHS,
+         seed: int = 0) -> Model:
+    """Fit a logistic regression by stochastic gradient descent.
+
+    Classes are weighted inversely to their frequency, since relevant papers
+    are usually the minority. Returns the (sparse) weights and the bias.
+    """
+    positives = sum(labels)
+    negatives = len(labels) - positives
+    class_weight = {True: len(labels) / (2 * positives), False: len(labels) / (2 * negatives)}
+    weights: Dict[int, float] = {}
+    bias = 0.0
+    order = list(range(len(vectors)))
+    rng = random.Random(seed)
+    step = 0
+    for _ in range(epochs):
+        rng.shuffle(order)
+        for i in order:
+            vector, label = vectors[i], labels[i]
+            rate = 0.5 / (1 + 0.001 * step)
+            step += 1
+            gradient = (_predict(weights, bias, vector) - label) * class_weight[label]
+            for bucket, value in vector.items():
+                weight = weights.get(bucket, 0.0)
+                weights[bucket] = weight - rate * (gradient * value + 1e-5 * weight)
+            bias -= rate * gradient
+    return weights, bias
+
+
+class RelevancePrefilter:
+    """Predicts whether GPT-4o will rate a paper relevant, from the words of its title and summary.
+
+    The model is an ensemble of logistic regressions over TF-IDF weighted,
+    hashed word features, one per cross-validation fold, trained on earlier
+    analyses. A paper's score is the mean of their probabilities. The
+    threshold is chosen so that ``target_recall`` of the relevant papers
+    scored at or above it in cross-validation; papers below it can be
+    skipped without calling the API.
+    """
+
+    def __init__(self, models: List[Model], idf: Dict[int, float],
+                 default_idf: float, threshold: float, min_relevance: float,
+                 n_features: int = PREFILTER_FEATURES, info: Optional[Dict[str, Any]] = None):
+        """Initialize the prefilter.
+
+        Args:
+            models: (weights by hash bucket, bias) of each model of the ensemble
+            idf: Inverse document frequency of each hash bucket seen in training
+            default_idf: Inverse document frequency of buckets not seen in training
+            threshold: Lowest score of the papers that are kept
+            min_relevance: Minimum relevance score the model was trained for;
+                         it is not recall-safe for lower minimums
+            n_features: Number of hash buckets of the features
+            info: Training details, such as the cross-validated recall
+        """
+        self.models = models
+        self.idf = idf
+        self.default_idf = default_idf
+        self.threshold = threshold
+        self.min_relevance = min_relevance
+        self.n_features = n_features
+        self.info = info or {}
+
+    def score(self, paper: Dict) -> float:
+        """Return the predicted probability that a paper is relevant."""
+        vector = tfidf(term_counts(paper, self.n_features), self.idf, self.default_idf)
+        return sum(_predict(weights, bias, vector) for weights, bias in self.models) / len(self.models)
+
+    def keep(self, paper: Dict) -> bool:
+        """Return whether a paper may be relevant and should be analyzed."""
+        return self.score(paper) >= self.threshold
+
+    @classmethod
+    def train(cls, examples: List[Tuple[Dict, Dict]], min_relevance: float = 0.7,
+              target_recall: float = PREFILTER_TARGET_RECALL,
+              n_features: int = PREFILTER_FEATURES,
+              folds: int = PREFILTER_FOLDS) -> 'RelevancePrefilter':
+        """Train a prefilter on analyzed papers.
+
+        The data is split into folds, and a model is trained on all but each
+        fold. The threshold is set from the scores each paper got from the
+        model that did not see it, and the prefilter keeps the fold models
+        and averages their probabilities, so new papers are scored like the
+        held-out ones the threshold was set on. The recall reached on new
+        papers is close to target_recall but not guaranteed, and varies
+        more when there are few relevant papers to train on. Raises
+        ValueError if target_recall is not in (0, 1], or if there are fewer
+        than PREFILTER_MIN_EXAMPLES relevant or other papers.
+
+        Args:
+            examples: (paper, analysis) pairs
+            min_relevance: Minimum relevance score of the papers to keep
+            target_recall: Share of relevant papers that must stay above the threshold
+            n_features: Number of hash buckets of the features
+            folds: Number of cross-validation folds
+        """
+        if not 0 < target_recall <= 1:
+            raise ValueError(f"Target recall must be above 0 and at most 1, got {target_recall}")
+        labels = [is_relevant(analysis, min_relevance) for _, analysis in examples]
+        positives = sum(labels)
+        if positives < PREFILTER_MIN_EXAMPLES or len(labels) - positives < PREFILTER_MIN_EXAMPLES:
+            raise ValueError(
+                f"Not enough analyses to train the prefilter: need at least "
+                f"{PREFILTER_MIN_EXAMPLES} relevant and {PREFILTER_MIN_EXAMPLES} other papers, "
+                f"found {positives} and {len(labels) - positives}")
+
+        counts = [term_counts(paper, n_features) for paper, _ in examples]
+        document_frequency: Dict[int, int] = {}
+        for paper_counts in counts:
+            for bucket in paper_counts:
+                document_frequency[bucket] = document_frequency.get(bucket, 0) + 1
+        idf = {bucket: math.log((1 + len(counts)) / (1 + frequency)) + 1
+               for bucket, frequency in document_frequency.items()}
+        default_idf = math.log(1 + len(counts)) + 1
+        vectors = [tfidf(paper_counts, idf, default_idf) for paper_counts in counts]
+
+        order = list(range(len(examples)))
+        random.Random(0).shuffle(order)
+        held_out_scores = [0.0] * len(examples)
+        models: List[Model] = []
+        for fold in range(folds):
+            held_out = set(order[fold::folds])
+            train = [i for i in order if i not in held_out]
+            weights, bias = _fit([vectors[i] for i in train], [labels[i] for i in train])
+            for i in held_out:
+                held_out_scores[i] = _predict(weights, bias, vectors[i])
+            models.append(({bucket: weight for bucket, weight in weights.items()
+                            if abs(weight) > 1e-6}, bias))
+
+        # Keep at least target_recall of the relevant papers: the threshold is
+        # the score of the relevant paper at the (1 - target_recall) quantile
+        positive_scores = sorted(score for score, label in zip(held_out_scores, labels) if label)
+        threshold = positive_scores[int((1 - target_recall) * len(positive_scores))]
+        kept = [score >= threshold for score in held_out_scores]
+
+        info = {
+            'trained_at': datetime.now().isoformat(),
+            'examples': len(examples),
+            'relevant': positives,
+            'target_recall': target_recall,
+            'cv_recall': sum(k for k, label in zip(kept, labels) if label) / positives,
+            'cv_skip_rate': kept.count(False) / len(kept),
+        }
+        return cls(models, idf, default_idf, threshold, min_relevance, n_features, info)
+
+    @classmethod
+    def train_from_cache(cls, cache_manager: CacheManager, min_relevance: float = 0.7,
+                         target_recall: float = PREFILTER_TARGET_RECALL) -> 'RelevancePrefilter':
+        """Train a prefilter on every paper analyzed in the analysis cache.
+
+        A paper can have several cached analyses, e.g. from single and packed
+        prompts; only the first one found is used, so no paper counts twice.
+        """
+        examples: Dict[str, Tuple[Dict, Dict]] = {}
+        for _, cached in cache_manager.items('analysis_'):
+            # Entries of older prompt versions may not hold the paper text
+            if not (isinstance(cached, dict) and 'title' in cached and 'analysis' in cached):
+                continue
+            paper = {'title': cached['title'], 'summary': cached['summary']}
+            content = json.dumps([paper['title'], paper['summary']])
+            examples.setdefault(hashlib.sha256(content.encode('utf-8')).hexdigest(),
+                                (paper, cached['analysis']))
+        return cls.train(list(examples.values()), min_relevance, target_recall)
+
+    def save(self, path: str) -> None:
+        """Write the prefilter to a JSON file."""
+        write_json_atomic(path, {
+            'models': [{'weights': {str(bucket): weight for bucket, weight in weights.items()},
+                        'bias': bias} for weights, bias in self.models],
+            'idf': {str(bucket): value for bucket, value in self.idf.items()},
+            'default_idf': self.default_idf,
+            'threshold': self.threshold,
+            'min_relevance': self.min_relevance,
+            'n_features': self.n_features,
+            'info': self.info,
+        })
+
+    @classmethod
+    def load(cls, path: str) -> 'RelevancePrefilter':
+        """Read a prefilter written by ``save``."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        models = [({int(bucket): weight for bucket, weight in model['weights'].items()},
+                   model['bias']) for model in data['models']]
+        return cls(models, {int(bucket): value for bucket, value in data['idf'].items()},
+                   data['default_idf'], data['threshold'], data['min_relevance'],
+                   data['n_features'], data.get('info'))
@@ -0,0 +1,132 @@
+"""Plan the smallest set of arXiv queries that covers a list of category combinations."""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+Combo = Tuple[str, Optional[str], str]
+
+
+class PlannedQuery(NamedTuple):
+    """A category query to send to arXiv and the original combos it answers."""
+    category_query: str
+    combos: List[Combo]
+
+
+def normalize_combo(combo: tuple) -> Combo:
+    """Return a canonical (cat1, cat2, operator) tuple for a category combination.
+
+    Single categories become ``(cat, None, 'AND')`` and the categories of
+    symmetric operators are sorted, so equivalent combinations compare equal.
+    """
+    cat1, cat2, operator = combo if len(combo) == 3 else (*combo, 'AND')
+    operator = (operator or 'AND').upper()
+    if not cat2 or cat2 == cat1:
+        return (cat1, None, 'AND')
+    if operator in ('AND', 'OR'):
+        cat1, cat2 = sorted((cat1, cat2))
+    return (cat1, cat2, operator)
+
+
+def combo_key(combo: tuple) -> str:
+    """Return a stable string key for a category combination, e.g. 'cs.AI|cs.LG'."""
+    cat1, cat2, operator = normalize_combo(combo)
+    if cat2 is None:
+        return cat1
+    separator = {'OR': '|', 'AND': '&', 'ANDNOT': '&!'}.get(operator, f' {operator} ')
+    return f'{cat1}{separator}{cat2}'
+
+
+def matches_combo(paper: Dict[str, Any], combo: Combo) -> bool:
+    """Check whether a paper's categories satisfy a normalized category combination."""
+    cat1, cat2, operator = combo
+    categories = paper['categories']
+    if cat2 is None:
+        return cat1 in categories
+    if operator == 'OR':
+        return cat1 in categories or cat2 in categories
+    if operator == 'ANDNOT':
+        return cat1 in categories and cat2 not in categories
+    return cat1 in categories and cat2 in categories
+
+
+def category_query(combos: Iterable[Combo]) -> str:
+    """Return an arXiv category query matching any of the given normalized combos.
+
+    Single categories and both sides of OR combinations are ORed together as
+    plain categories; AND and ANDNOT combinations become parenthesized terms.
+    """
+    terms: List[str] = []
+    for cat1, cat2, operator in combos:
+        if cat2 is None or operator == 'OR':
+            for category in (cat1, cat2):
+                if category and f'cat:{category}' not in terms:
+                    terms.append(f'cat:{category}')
+        else:
+            terms.append(f'(cat:{cat1} {operator} cat:{cat2})')
+    query = ' OR '.join(terms)
+    return f'({query})' if len(terms) > 1 else query
+
+
+def plan_queries(categories: Iterable[tuple]) -> List[PlannedQuery]:
+    """Collapse category combinations into a minimal set of arXiv queries.
+
+    Every single category and both sides of every OR combination go into one
+    ``cat:A OR cat:B OR ...`` query. AND and ANDNOT combinations whose first
+    category is already part of that union are answered by filtering its
+    results; the rest get a query of their own. The client pages the union
+    until every combo it answers has its own share of results, so a dense
+    category does not starve the others (see ``ArxivClient._iter_query``).
+    """
+    combos: List[Combo] = []
+    for combo in categories:
+        normalized = normalize_combo(combo)
+        if normalized not in combos:
+            combos.append(normalized)
+
+    union: List[str] = []
+    union_combos: List[Combo] = []
+    for cat1, cat2, operator in combos:
+        if cat2 is None or operator == 'OR':
+            union_combos.append((cat1, cat2, operator))
+            for category in (cat1, cat2):
+                if category and category not in union:
+                    union.append(category)
+
+    plan: List[PlannedQuery] = []
+    for combo in combos:
+        if combo in union_combos:
+            continue
+        cat1, cat2, operator = combo
+        if cat1 in union or (operator == 'AND' and cat2 in union):
+            union_combos.append(combo)
+        else:
+            plan.append(PlannedQuery(category_query([combo]), [combo]))
+
+    if union:
+        query = ' OR '.join(f'cat:{category}' for category in union)
+        if len(union) > 1:
+            query = f'({query})'
+        plan.insert(0, PlannedQuery(query, union_combos))
+
+    return plan
+
+
+def split_by_combo(papers: Iterable[Dict[str, Any]], categories: Iterable[tuple],
+                   max_results: Optional[int] = None) -> Dict[Combo, List[Dict[str, Any]]]:
+    """Assign papers to every normalized combination they match, newest first.
+
+    Args:
+        papers: Papers sorted by descending submission date
+        categories: The original category combinations
+        max_results: Optional cap on papers kept per combination
+    """
+    results: Dict[Combo, List[Dict[str, Any]]] = {}
+    for combo in categories:
+        results.setdefault(normalize_combo(combo), [])
+
+    for paper in papers:
+        for combo, matched in results.items():
+            if max_results is not None and len(matched) >= max_results:
+                continue
+            if matches_combo(paper, combo):
+                matched.append(paper)
+    return results
@@ -0,0 +1,96 @@
+"""Thread-safe limiters for API requests."""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class RateLimiter:
+    """Token bucket that hands out at most one request slot per ``interval`` seconds.
+
+    Slots are reserved under a lock and the caller sleeps outside it, so any
+    number of threads can share one limiter while requests stay spaced by
+    ``interval`` seconds (with up to ``burst`` requests allowed back to back).
+    """
+
+    def __init__(self, interval: float, burst: int = 1):
+        self.interval = interval
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request slot is available."""
+        with self._lock:
+            now = time.monotonic()
+            if self.interval > 0:
+                self._tokens = min(self.burst,
+                                   self._tokens + (now - self._updated) / self.interval)
+            else:
+                self._tokens = self.burst
+            self._updated = now
+            # Reserve a slot even if the bucket is empty; the debt is paid by sleeping
+            self._tokens -= 1
+            wait = -self._tokens * self.interval if self._tokens < 0 else 0
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Bounds the number of requests in flight, adapting the bound to rate limiting.
+
+    The bound starts at ``max_concurrency``. Each throttled (HTTP 429)
+    response halves it and pauses new requests for the server's Retry-After
+    delay; after as many successes in a row as the current bound, it grows
+    by one again, up to ``max_concurrency``.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.throttled = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the request slots for the duration of the block."""
+        with self._condition:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self.in_flight < self.limit:
+                    break
+                else:
+                    self._condition.wait()
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def record_success(self) -> None:
+        """Count a successful request, raising the bound after enough of them."""
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+    def record_throttled(self, retry_after: float) -> None:
+        """Halve the bound and pause new requests for ``retry_after`` seconds."""
+        with self._condition:
+            self.throttled += 1
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+            self._condition.notify_all()
@@ -0,0 +1,130 @@
+"""Cache of raw arXiv API responses, revalidated with conditional requests."""
+
+import base64
+import gzip
+import hashlib
+import io
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from .cache_manager import CacheManager
+from .config import HTTP_CACHE_FRESHNESS, HTTP_CACHE_RETENTION
+from .http_pool import HTTPConnectionPool, get_default_pool
+from .rate_limiter import RateLimiter
+
+
+class CachedResponse:
+    """Response body replayed from the cache, with gzip transparently decoded."""
+
+    status = 200
+
+    def __init__(self, url: str, body: bytes, content_encoding: str):
+        self.url = url
+        stream = io.BytesIO(body)
+        self._body = gzip.GzipFile(fileobj=stream) if content_encoding == 'gzip' else stream
+
+    def read(self, size: int = -1) -> bytes:
+        """Read decoded bytes from the body."""
+        return self._body.read(size)
+
+
+class ResponseCache:
+    """Caches API response bodies by URL, as sent by the server (usually gzip-compressed).
+
+    A response younger than ``freshness`` seconds is replayed without any
+    network access or rate-limit wait. Older responses are revalidated with
+    ``If-None-Match``/``If-Modified-Since`` when the server sent an ETag or
+    Last-Modified header; a 304 reply refreshes the entry and replays the
+    cached body. ``stats`` counts responses served fresh from the cache,
+    revalidated with a 304, and fetched in full.
+    """
+
+    def __init__(self, cache_manager: CacheManager, http_pool: Optional[HTTPConnectionPool] = None,
+                 freshness: float = HTTP_CACHE_FRESHNESS, retention: float = HTTP_CACHE_RETENTION):
+        """Initialize the response cache.
+
+        Args:
+            cache_manager: Cache the responses are stored in
+            http_pool: Pool used for network requests; defaults to the shared pool
+            freshness: Seconds a response is replayed without revalidation
+            retention: Seconds a response is kept for revalidation
+        """
+        self.cache_manager = cache_manager
+        self.http_pool = http_pool or get_default_pool()
+        self.freshness = freshness
+        self.retention = retention
+        self.stats = {'fresh': 0, 'revalidated': 0, 'fetched': 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(url: str) -> str:
+        """Return the cache key of a URL's response."""
+        return f"http_{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _replay(self, url: str, cached: Dict[str, Any]) -> CachedResponse:
+        return CachedResponse(url, base64.b64decode(cached['body']), cached['content_encoding'])
+
+    def _store(self, key: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+        cached = {**cached, 'validated_at': time.time()}
+        self.cache_manager.set(key, cached, self.retention)
+        return cached
+
+    @contextmanager
+    def open(self, url: str, rate_limiter: Optional[RateLimiter] = None) -> Iterator[Any]:
+        """Yield the response for a URL, from the cache when possible.
+
+        Args:
+            url: URL to GET
+            rate_limiter: Limiter acquired before any network request; replays
+                       of fresh responses do not wait for it
+        """
+        key = self.cache_key(url)
+        cached = self.cache_manager.get(key)
+        if cached is not None and time.time() - cached['validated_at'] < self.freshness:
+            self._count('fresh')
+            yield self._replay(url, cached)
+            return
+
+        headers = {}
+        if cached is not None:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        capture = io.BytesIO()
+        with self.http_pool.open(url, headers, capture) as response:
+            if response.status == 304 and cached is not None:
+                self._count('revalidated')
+                cached = self._store(key, {
+                    **cached, 'etag': response.headers.get('ETag') or cached.get('etag')})
+                yield self._replay(url, cached)
+                return
+
+            self._count('fetched')
+            complete = False
+            try:
+                yield response
+                complete = True
+            except GeneratorExit:
+                # The consumer stopped reading early; the rest of the body is still cacheable
+                complete = True
+                raise
+            finally:
+                if complete:
+                    response.drain()
+                    self._store(key, {
+                        'url': url,
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'content_encoding': response.content_encoding,
+                        'body': base64.b64encode(capture.getvalue()).decode('ascii'),
+                    })
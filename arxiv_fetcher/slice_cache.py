@@ -0,0 +1,274 @@
+"""Cache fetch results as per-category, per-day slices."""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .arxiv_client import ArxivClient
+from .cache_manager import CacheManager
+from .config import CACHE_SETTLED_DAYS, CACHE_SETTLED_DURATION
+from .paper import Paper, as_dicts
+from .query_planner import Combo, combo_key, matches_combo, normalize_combo
+
+SliceId = Tuple[Combo, date]
+
+
+def get_cache_key(combo: tuple, day: date) -> str:
+    """Return the cache key of a combo's papers submitted on one UTC day.
+
+    Equivalent combinations share a key, e.g. 'papers_cs.AI|cs.LG_2024-01-08'
+    for both ``cs.AI cs.LG OR`` and ``cs.LG cs.AI OR``.
+    """
+    return f"papers_{combo_key(combo)}_{day.isoformat()}"
+
+
+def get_partial_cache_key(combo: tuple, day: date) -> str:
+    """Return the cache key of the newest papers of a day that a capped fetch stopped in."""
+    return f"{get_cache_key(combo, day)}_partial"
+
+
+def slice_combos(combo: Combo) -> List[Combo]:
+    """Return the combos whose day slices are stored for a normalized combination.
+
+    OR combinations are stored as the slices of both of their categories, so
+    they share entries with single-category requests. AND and ANDNOT
+    combinations get a slice of their own, which is much smaller than their
+    first category's.
+    """
+    cat1, cat2, operator = combo
+    if cat2 is None:
+        return [combo]
+    if operator == 'OR':
+        return [(cat1, None, 'AND'), (cat2, None, 'AND')]
+    return [combo]
+
+
+class SliceCache:
+    """Assembles fetch results from cached per-category, per-day slices.
+
+    Each slice holds every paper a category (or AND/ANDNOT combination)
+    received on one UTC day, so requests for different ``--days`` values and
+    equivalent category combinations reuse the same entries, and a request
+    only fetches the days it is missing. Recent days expire after the cache's
+    duration; days older than CACHE_SETTLED_DAYS no longer change and are
+    kept for CACHE_SETTLED_DURATION.
+    """
+
+    def __init__(self, cache_manager: CacheManager, arxiv_client: ArxivClient,
+                 stale_while_revalidate: bool = False):
+        """Initialize the slice cache.
+
+        Args:
+            cache_manager: Cache the slices are stored in
+            arxiv_client: Client used to fetch missing slices
+            stale_while_revalidate: Use expired slices still within the cache's
+                       max_staleness; they are collected in ``stale`` so the
+                       caller can refresh them
+        """
+        self.cache_manager = cache_manager
+        self.arxiv_client = arxiv_client
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale: Dict[Combo, Set[date]] = {}
+
+    def _read(self, source: Combo, day: date, partial: bool = False) -> Optional[List[Paper]]:
+        """Return a cached slice, or partial slice, noting it in ``stale`` if it has expired."""
+        key = get_partial_cache_key(source, day) if partial else get_cache_key(source, day)
+        if self.stale_while_revalidate:
+            cached = self.cache_manager.get_stale(key)
+            if cached is None:
+                return None
+            data, expired = cached
+            if expired:
+                self.stale.setdefault(source, set()).add(day)
+        else:
+            data = self.cache_manager.get(key)
+            if data is None:
+                return None
+        return [Paper.from_dict(paper) for paper in data]
+
+    def _lookup(self, source: Combo, day: date) -> Optional[List[Paper]]:
+        """Return a slice, deriving AND/ANDNOT slices from a cached category slice if possible."""
+        cat1, cat2, operator = source
+        if cat2 is not None:
+            # Every paper of an AND/ANDNOT combo is in its first category's slice
+            covering = [cat1, cat2] if operator == 'AND' else [cat1]
+            for category in covering:
+                papers = self._read((category, None, 'AND'), day)
+                if papers is not None:
+                    return [paper for paper in papers if matches_combo(paper, source)]
+        return self._read(source, day)
+
+    def _duration(self, day: date, today: date) -> float:
+        """Return how long the slice of a day stays valid."""
+        if (today - day).days > CACHE_SETTLED_DAYS:
+            return CACHE_SETTLED_DURATION
+        return self.cache_manager.cache_duration
+
+    def _fetch_range(self, sources: List[Combo], first_day: date, last_day: date,
+                     max_results: int, concurrency: int) -> Dict[SliceId, List[Paper]]:
+        """Fetch the slices of several combos over a range of days and cache the complete ones.
+
+        Results are newest first and capped at max_results per combo. Only a
+        combo the client scanned to the start of the window (see
+        ``ArxivClient.complete_combos``) has every day complete; otherwise
+        the fetch stopped within its oldest fetched day. That day is cached
+        as a partial slice, holding its papers from the oldest one fetched
+        on, and the days before it are returned for this request but not
+        cached.
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        window_start = datetime.combine(first_day, time.min)
+        window_end = datetime.combine(last_day, time.max)
+        # One extra minute so the client's own clock cannot start the window late
+        days = (now - window_start) / timedelta(days=1) + 1 / 1440
+        since = {source: window_start for source in sources}
+
+        fetched = self.arxiv_client.fetch_papers_by_combo(
+            days, max_results, sources, concurrency, since, window_end)
+
+        slices: Dict[SliceId, List[Paper]] = {}
+        for source in sources:
+            papers = fetched.get(source, [])
+            if source in self.arxiv_client.complete_combos:
+                complete_after = first_day - timedelta(days=1)
+            elif papers:
+                complete_after = papers[-1].published_at.date()
+            else:
+                complete_after = last_day
+
+            # Days without any papers are cached as empty slices too
+            by_day: Dict[date, List[Paper]] = {}
+            day = first_day
+            while day <= last_day:
+                by_day[day] = []
+                day += timedelta(days=1)
+            for paper in papers:
+                by_day.setdefault(paper.published_at.date(), []).append(paper)
+
+            for day, day_papers in by_day.items():
+                slices[(source, day)] = day_papers
+                if day > complete_after:
+                    key = get_cache_key(source, day)
+                elif day == complete_after and day_papers:
+                    key = get_partial_cache_key(source, day)
+                else:
+                    continue
+                self.cache_manager.set(key, as_dicts(day_papers), self._duration(day, now.date()))
+        return slices
+
+    def fetch_slices(self, missing: Dict[Combo, Set[date]], max_results: int,
+                     concurrency: int) -> Dict[SliceId, List[Paper]]:
+        """Fetch the given days of each combo, batching combos that miss the same days.
+
+        A fill lock is held while fetching, and slices another worker cached
+        in the meantime are not fetched again.
+        """
+        slices: Dict[SliceId, List[Paper]] = {}
+        if not missing:
+            return slices
+
+        lock_key = 'slices:' + ','.join(sorted(combo_key(source) for source in missing))
+        with self.cache_manager.fill_lock(lock_key):
+            ranges: Dict[Tuple[date, date], List[Combo]] = {}
+            for source, days in missing.items():
+                still_missing = []
+                for day in days:
+                    data = self.cache_manager.get(get_cache_key(source, day), record=False)
+                    if data is None:
+                        still_missing.append(day)
+                    else:
+                        slices[(source, day)] = [Paper.from_dict(paper) for paper in data]
+                if still_missing:
+                    day_range = (min(still_missing), max(still_missing))
+                    ranges.setdefault(day_range, []).append(source)
+
+            for (first_day, last_day), sources in ranges.items():
+                slices.update(self._fetch_range(sources, first_day, last_day,
+                                                max_results, concurrency))
+        return slices
+
+    def refresh_stale(self, max_results: int, concurrency: int) -> None:
+        """Refetch the expired slices used by the last ``fetch``."""
+        stale, self.stale = self.stale, {}
+        self.fetch_slices(stale, max_results, concurrency)
+
+    def _collect(self, combo: Combo, days: List[date], start_date: datetime, max_results: int,
+                 slices: Dict[SliceId, List[Paper]],
+                 missing: Optional[Dict[Combo, Set[date]]] = None) -> List[Paper]:
+        """Return a combo's papers from the slices of the given days, newest first.
+
+        Slices not yet in ``slices`` are looked up in the cache, and those not
+        cached either are added to ``missing``. Days are walked newest first
+        and older days are not needed once max_results papers are found.
+
+        A partial slice, cached when a capped fetch stopped within a day,
+        stands in for the day's slice if it completes max_results papers:
+        it has every paper of the day from its oldest one on, and those are
+        then the newest ones. Otherwise the day is still missing.
+        """
+        papers: Dict[str, Paper] = {}
+        for day in days:
+            partial: Dict[Combo, List[Paper]] = {}
+            for source in slice_combos(combo):
+                if (source, day) not in slices:
+                    found = self._lookup(source, day)
+                    if found is None:
+                        found = self._read(source, day, partial=True)
+                        if found:
+                            partial[source] = found
+                        elif missing is not None:
+                            missing.setdefault(source, set()).add(day)
+                        continue
+                    slices[(source, day)] = found
+                for paper in slices[(source, day)]:
+                    if paper.published_at >= start_date and matches_combo(paper, combo):
+                        papers.setdefault(ArxivClient.paper_id(paper), paper)
+
+            if partial:
+                # Only papers from the newest partial slice's oldest paper on are known in full
+                known_from = max(min(paper.published_at for paper in found)
+                                 for found in partial.values())
+                for found in partial.values():
+                    for paper in found:
+                        if paper.published_at >= start_date and matches_combo(paper, combo):
+                            papers.setdefault(ArxivClient.paper_id(paper), paper)
+                known = [paper for paper in papers.values() if paper.published_at >= known_from]
+                if len(known) < max_results:
+                    if missing is not None:
+                        for source in partial:
+                            missing.setdefault(source, set()).add(day)
+                    continue
+                slices.update(((source, day), found) for source, found in partial.items())
+                papers = {ArxivClient.paper_id(paper): paper for paper in known}
+            if len(papers) >= max_results:
+                break
+        newest_first = sorted(papers.values(), key=lambda paper: paper.published_at,
+                              reverse=True)
+        return newest_first[:max_results]
+
+    def fetch(self, days: int, categories: Iterable[tuple], max_results: int,
+              concurrency: int = 1) -> List[Paper]:
+        """Return the papers of the last ``days`` days for every combo, newest first.
+
+        Args:
+            days: Number of days to look back
+            categories: List of (cat1, cat2, operator) tuples
+            max_results: Maximum number of results per category combination
+            concurrency: Number of arXiv queries fetched in parallel for missing slices
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        start_date = now - timedelta(days=days)
+        window_days = [now.date() - timedelta(days=offset)
+                       for offset in range((now.date() - start_date.date()).days + 1)]
+        combos = list(dict.fromkeys(normalize_combo(combo) for combo in categories))
+
+        slices: Dict[SliceId, List[Paper]] = {}
+        missing: Dict[Combo, Set[date]] = {}
+        for combo in combos:
+            self._collect(combo, window_days, start_date, max_results, slices, missing)
+        slices.update(self.fetch_slices(missing, max_results, concurrency))
+
+        papers: Dict[str, Paper] = {}
+        for combo in combos:
+            for paper in self._collect(combo, window_days, start_date, max_results, slices):
+                papers.setdefault(ArxivClient.paper_id(paper), paper)
+        return sorted(papers.values(), key=lambda paper: paper.published_at, reverse=True)
@@ -0,0 +1,116 @@
+"""Check that CLI startup does not import heavy dependencies it does not need.
+
+Each case runs in a fresh interpreter under ``python -X importtime``. A
+case fails if any of its forbidden modules (or their submodules) were
+imported, so a new top-level import of e.g. openai, rich or sqlite3 in
+the CLI path is caught. The import time of each case is reported, and
+``--max-ms`` also fails cases whose imports take longer than that.
+
+Run it from anywhere; it exits with status 1 if a case fails::
+
+    python scripts/check_import_time.py --max-ms 500
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import List, Optional, Sequence, Set, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that only some subcommands need, and only once they run
+HEAVY_MODULES = ('openai', 'rich', 'sqlite3', 'llama_index', 'llama_parse', 'zstandard')
+
+SUBCOMMANDS = ('fetch', 'harvest', 'analyze', 'download', 'parse', 'summarize',
+               'categories', 'cache', 'prefilter')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s*(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$')
+
+RUN_CLI = ("import sys; sys.argv = ['arxiv-fetch'] + sys.argv[1:]; "
+           "from arxiv_fetcher.cli import main; main()")
+
+# (description, python -c code, arguments, modules that must not be imported)
+CASES: List[Tuple[str, str, List[str], Sequence[str]]] = [
+    ('arxiv-fetch --help', RUN_CLI, ['--help'], HEAVY_MODULES),
+    *[(f'arxiv-fetch {command} --help', RUN_CLI, [command, '--help'], HEAVY_MODULES)
+      for command in SUBCOMMANDS],
+    ('arxiv-fetch categories', RUN_CLI, ['categories'],
+     [module for module in HEAVY_MODULES if module != 'rich']),
+    # The modules the fetch and analyze commands load before their first request
+    ('fetch modules', 'import arxiv_fetcher.slice_cache, arxiv_fetcher.response_cache', [],
+     ['openai', 'llama_index', 'llama_parse']),
+    ('analyze modules', 'import arxiv_fetcher.paper_analyzer, arxiv_fetcher.prefilter', [],
+     ['openai', 'rich', 'llama_index', 'llama_parse']),
+]
+
+
+def measure(code: str, arguments: List[str]) -> Tuple[Set[str], float]:
+    """Run code in a fresh interpreter and return the modules it imported and their import time.
+
+    The time is the sum of the cumulative times of the top-level imports,
+    in milliseconds. Raises RuntimeError if the code fails.
+    """
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(
+        filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))}
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code, *arguments],
+                            cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, text=True)
+    modules: Set[str] = set()
+    microseconds = 0
+    errors = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            if not line.startswith('import time:'):
+                errors.append(line)
+            continue
+        _, cumulative, indent, module = match.groups()
+        modules.add(module)
+        if len(indent) == 1:
+            microseconds += int(cumulative)
+    if result.returncode != 0:
+        raise RuntimeError('\n'.join(errors) or f"exit status {result.returncode}")
+    return modules, microseconds / 1000
+
+
+def forbidden_imports(modules: Set[str], forbidden: Sequence[str]) -> List[str]:
+    """Return the forbidden top-level packages among the imported modules."""
+    return sorted({module.split('.')[0] for module in modules
+                   if module.split('.')[0] in forbidden})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Check the imports done at CLI startup')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Also fail cases whose imports take longer than this')
+    args = parser.parse_args(argv)
+
+    failures = 0
+    for description, code, arguments, forbidden in CASES:
+        try:
+            modules, milliseconds = measure(code, arguments)
+        except RuntimeError as e:
+            print(f"FAIL  {description}: {str(e)}")
+            failures += 1
+            continue
+        problems = []
+        loaded = forbidden_imports(modules, forbidden)
+        if loaded:
+            problems.append(f"imports {', '.join(loaded)}")
+        if args.max_ms is not None and milliseconds > args.max_ms:
+            problems.append(f"over the {args.max_ms:.0f} ms budget")
+        status = 'FAIL' if problems else 'ok'
+        print(f"{status:5} {description:32} {milliseconds:7.1f} ms"
+              + (f"  ({'; '.join(problems)})" if problems else ''))
+        failures += bool(problems)
+
+    if failures:
+        print(f"{failures} of {len(CASES)} cases failed")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Shared fixtures: an in-memory arXiv API that answers the queries the client sends."""
+
+import contextlib
+import io
+import re
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+import pytest
+
+from arxiv_fetcher.arxiv_client import ArxivClient
+from arxiv_fetcher.rate_limiter import RateLimiter
+
+QUERY = re.compile(r'^(.*) AND submittedDate:\[(\d{12}) TO (\d{12})\]$')
+TOKEN = re.compile(r'\(|\)|ANDNOT|AND|OR|cat:[\w.-]+')
+
+
+def matches_query(expression: str, categories: Sequence[str]) -> bool:
+    """Evaluate an arXiv category query such as '(cat:a OR (cat:b ANDNOT cat:c))'."""
+    tokens = TOKEN.findall(expression)
+    python = []
+    for token in tokens:
+        if token.startswith('cat:'):
+            python.append(repr(token[4:] in categories))
+        else:
+            python.append({'ANDNOT': 'and not', 'AND': 'and', 'OR': 'or'}.get(token, token))
+    return eval(' '.join(python))
+
+
+def atom_feed(entries: List[Tuple[str, datetime, Sequence[str]]], total: int) -> bytes:
+    """Return an Atom feed of (arXiv ID, published, categories) entries."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<feed xmlns="http://www.w3.org/2005/Atom" '
+             'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">',
+             f'<opensearch:totalResults>{total}</opensearch:totalResults>']
+    for arxiv_id, published, categories in entries:
+        lines.append(
+            f'<entry><id>http://arxiv.org/abs/{arxiv_id}v1</id>'
+            f'<published>{published.strftime("%Y-%m-%dT%H:%M:%SZ")}</published>'
+            f'<title>Paper {arxiv_id}</title><summary>About {arxiv_id}</summary>'
+            f'<author><name>A. Author</name></author>'
+            + ''.join(f'<category term="{category}"/>' for category in categories)
+            + '</entry>')
+    lines.append('</feed>')
+    return '\n'.join(lines).encode('utf-8')
+
+
+class FakeArxiv:
+    """Stands in for the HTTP pool, answering search queries from a list of papers.
+
+    ``requests`` counts the queries answered and ``served`` the entries sent.
+    """
+
+    def __init__(self):
+        self.papers: List[Tuple[str, datetime, List[str]]] = []
+        self.requests = 0
+        self.served = 0
+
+    def add(self, published: datetime, *categories: str) -> str:
+        """Add a paper and return its arXiv ID."""
+        arxiv_id = f'2401.{len(self.papers):05d}'
+        self.papers.append((arxiv_id, published, list(categories)))
+        return arxiv_id
+
+    def open(self, url: str, headers: Optional[dict] = None):
+        self.requests += 1
+        params = urllib.parse.parse_qs(urllib.parse.urlsplit(url).query)
+        expression, first, last = QUERY.match(params['search_query'][0]).groups()
+        rows = sorted(
+            (paper for paper in self.papers
+             if first <= paper[1].strftime('%Y%m%d%H%M') <= last
+             and matches_query(expression, paper[2])),
+            key=lambda paper: paper[1], reverse=True)
+        start, size = int(params['start'][0]), int(params['max_results'][0])
+        page = rows[start:start + size]
+        self.served += len(page)
+        return contextlib.closing(io.BytesIO(atom_feed(page, len(rows))))
+
+
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+@pytest.fixture
+def now() -> datetime:
+    """The current time, rounded down to the minute like arXiv's date filter."""
+    return utc_now().replace(second=0, microsecond=0)
+
+
+@pytest.fixture
+def arxiv() -> FakeArxiv:
+    return FakeArxiv()
+
+
+@pytest.fixture
+def client(arxiv: FakeArxiv) -> ArxivClient:
+    return ArxivClient(RateLimiter(0), http_pool=arxiv)
+
+
+def spread(now: datetime, count: int, days: float) -> List[datetime]:
+    """Return count distinct publication times spread evenly over the last days, newest first."""
+    step = timedelta(days=days) / count
+    return [now - timedelta(minutes=5) - step * i for i in range(count)]
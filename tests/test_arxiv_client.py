@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+from conftest import spread
+
+from arxiv_fetcher.query_planner import matches_combo
+
+
+def newest(arxiv, combo, count):
+    """Return the IDs of the newest papers of the fake server that match a combo."""
+    matching = sorted((paper for paper in arxiv.papers
+                       if matches_combo({'categories': paper[2]}, combo)),
+                      key=lambda paper: paper[1], reverse=True)
+    return [paper[0] for paper in matching[:count]]
+
+
+def test_andnot_combo_outside_union_gets_its_newest_papers(arxiv, client, now):
+    # cs.LG is not part of the cs.HC union, so the ANDNOT combo has a query of
+    # its own, while the older cs.HC papers that are also in cs.LG match it too
+    for published in spread(now, 150, 1):
+        arxiv.add(published, 'cs.LG')
+    for published in spread(now - timedelta(days=1), 60, 2):
+        arxiv.add(published, 'cs.HC', 'cs.LG')
+    for published in spread(now, 20, 3):
+        arxiv.add(published, 'cs.CY', 'cs.CL')
+
+    combos = [('cs.LG', 'cs.CY', 'ANDNOT'), ('cs.HC', None, 'AND'), ('cs.CY', 'cs.CL', 'AND')]
+    results = client.fetch_papers_by_combo(3, 100, combos)
+
+    for combo in [('cs.LG', 'cs.CY', 'ANDNOT'), ('cs.HC', None, 'AND'), ('cs.CL', 'cs.CY', 'AND')]:
+        ids = [client.paper_id(paper) for paper in results[combo]]
+        assert ids == newest(arxiv, combo, 100)
+
+
+def test_pages_ask_only_for_the_entries_still_needed(arxiv, client, now):
+    for published in spread(now, 500, 2):
+        arxiv.add(published, 'cs.LG')
+
+    papers = client.fetch_papers(3, 100, [('cs.LG', None, 'AND')])
+
+    assert len(papers) == 100
+    assert (arxiv.requests, arxiv.served) == (1, 100)
+
+
+def test_paging_continues_until_max_results(arxiv, client, now):
+    for published in spread(now, 500, 2):
+        arxiv.add(published, 'cs.LG')
+
+    papers = client.fetch_papers(3, 450, [('cs.LG', None, 'AND')])
+
+    assert len(papers) == 450
+    # Two full pages of PAGE_SIZE (200), then the 50 still needed
+    assert (arxiv.requests, arxiv.served) == (3, 450)
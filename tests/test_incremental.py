@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from conftest import spread
+
+from arxiv_fetcher import cli
+
+
+def test_incremental_fetch_keeps_every_paper_since_the_watermark(arxiv, client, now,
+                                                                  tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, 'INCREMENTAL_STATE_FILE', str(tmp_path / 'incremental.json'))
+    for published in spread(now - timedelta(days=2), 50, 3):
+        arxiv.add(published, 'cs.LG')
+    first = cli.fetch_incremental(client, 7, [('cs.LG', None, 'AND')], 1)
+
+    # More new papers than MAX_RESULTS (100) arrive before the next run
+    for published in spread(now, 160, 1.5):
+        arxiv.add(published, 'cs.LG')
+    second = cli.fetch_incremental(client, 7, [('cs.LG', None, 'AND')], 1)
+
+    assert len(first) == 50
+    assert len(second) == 210
+    assert sorted(client.paper_id(paper) for paper in second) == \
+        sorted(paper[0] for paper in arxiv.papers)
@@ -0,0 +1,45 @@
+import random
+
+from arxiv_fetcher.cache_manager import CacheManager
+from arxiv_fetcher.paper_analyzer import analysis_cache_key
+from arxiv_fetcher.prefilter import RelevancePrefilter
+
+FILLER = 'we study models data learning neural network method results theory graph loss'.split()
+
+
+def examples(count, seed=0):
+    """Return papers whose relevance depends on whether they mention deployment."""
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        relevant = i % 3 == 0
+        words = [rng.choice(FILLER) for _ in range(40)]
+        if relevant:
+            words += ['deployment', 'industry']
+        rng.shuffle(words)
+        paper = {'title': f'Paper {i}', 'summary': ' '.join(words)}
+        pairs.append((paper, {'is_relevant': relevant, 'relevance_score': 0.9 if relevant else 0.1}))
+    return pairs
+
+
+def test_saved_prefilter_scores_like_the_trained_one(tmp_path):
+    prefilter = RelevancePrefilter.train(examples(120))
+    prefilter.save(str(tmp_path / 'prefilter.json'))
+    loaded = RelevancePrefilter.load(str(tmp_path / 'prefilter.json'))
+
+    papers = [paper for paper, _ in examples(30, seed=1)]
+    assert [loaded.score(paper) for paper in papers] == [prefilter.score(paper) for paper in papers]
+    assert len(loaded.models) == 5
+
+
+def test_train_from_cache_counts_each_paper_once(tmp_path):
+    cache = CacheManager(str(tmp_path / 'analyses.db'), 3600)
+    for paper, analysis in examples(120):
+        # Single and packed analyses of the same paper are cached under different keys
+        for pack_size in (1, 4):
+            cache.set(analysis_cache_key(paper, pack_size), {**paper, 'analysis': analysis})
+
+    prefilter = RelevancePrefilter.train_from_cache(cache)
+
+    assert prefilter.info['examples'] == 120
+    assert prefilter.info['relevant'] == 40
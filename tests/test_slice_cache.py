@@ -0,0 +1,37 @@
+from conftest import spread
+
+from arxiv_fetcher.cache_manager import CacheManager
+from arxiv_fetcher.slice_cache import SliceCache
+
+
+def slice_cache(tmp_path, client):
+    return SliceCache(CacheManager(str(tmp_path / 'cache.db'), 3600), client)
+
+
+def test_second_capped_fetch_makes_no_requests(arxiv, client, now, tmp_path):
+    # 600 cs.AI papers over the last 6 days, far more than the cap of 100
+    for published in spread(now, 600, 6):
+        arxiv.add(published, 'cs.AI')
+    cache = slice_cache(tmp_path, client)
+
+    first = cache.fetch(7, [('cs.AI', None, 'AND')], 100)
+    requests = arxiv.requests
+    second = cache.fetch(7, [('cs.AI', None, 'AND')], 100)
+
+    assert len(first) == 100
+    assert arxiv.requests == requests
+    assert [paper.link for paper in second] == [paper.link for paper in first]
+
+
+def test_partial_day_does_not_satisfy_a_higher_cap(arxiv, client, now, tmp_path):
+    for published in spread(now, 600, 6):
+        arxiv.add(published, 'cs.AI')
+    cache = slice_cache(tmp_path, client)
+
+    cache.fetch(7, [('cs.AI', None, 'AND')], 100)
+    requests = arxiv.requests
+    papers = cache.fetch(7, [('cs.AI', None, 'AND')], 150)
+
+    assert arxiv.requests > requests
+    expected = sorted(arxiv.papers, key=lambda paper: paper[1], reverse=True)[:150]
+    assert [client.paper_id(paper) for paper in papers] == [paper[0] for paper in expected]